@@ -1,4 +1,5 @@
 import pygame
+import assets
 from Component import Component,Coordinate
 from typing import Dict,Callable
 
@@ -60,12 +61,13 @@ class Button(Component):
             max_width = self.surface.get_width()
             max_height = self.surface.get_height()
 
+            #scaled copies are shared and kept by the asset cache, redrawing at the same size does not scale again
             if actual_height > max_height and actual_width > max_width:
-                target_display_surface = pygame.transform.scale(target_display_surface,(max_width,max_height))
+                target_display_surface = assets.scale_image(target_display_surface,(max_width,max_height))
             elif actual_height > max_height:
-                target_display_surface = pygame.transform.scale(target_display_surface,(actual_width,max_height))
+                target_display_surface = assets.scale_image(target_display_surface,(actual_width,max_height))
             elif actual_width > max_width:
-                target_display_surface = pygame.transform.scale(target_display_surface,(max_width,actual_height))
+                target_display_surface = assets.scale_image(target_display_surface,(max_width,actual_height))
 
 
             #center image on surface
@@ -77,6 +79,8 @@ class Button(Component):
 
             self.surface.blit(target_display_surface,(left,top))
 
+        self.dirty = True
+
     
     def resize(self,dimensions:Coordinate):
         self.set_dimensions(dimensions)
@@ -134,7 +138,7 @@ class Button(Component):
             return False
         
         self.state = state
-        self.draw()
+        self.invalidate()
         return True
 
 
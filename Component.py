@@ -10,22 +10,48 @@ class Component:
         
         self.position = position #position relative to parent surface
         self.parent : Component | None = parent
+
+        #components whose surfaces are blitted onto this one
+        self.children : list[Component] = []
+
+        if parent != None:
+            parent.children.append(self)
+
+        self.dirty = True #surface has changed since it was last blitted onto its parent / the window, cleared by whoever blits it
+        self.dirty_rects : list[pygame.Rect] | None = None #areas of the surface that changed while dirty, None if all of it did (see mark_dirty)
+        self.invalid = True #surface is out of date and has to be redrawn on the next compose, set through invalidate
+
+        #cached result of get_position_relative_to_window, cleared when this component or a parent moves
+        self._window_position : Coordinate | None = None
     
 
     ### SETTERS ###
 
     def set_position(self,position:Coordinate):
+        if position == self.position:
+            return
+
         self.position = position
+        self._clear_window_position()
+
+        #the parent has to blit this component in its new position
+        if self.parent != None:
+            self.parent.invalidate()
 
+    #a new surface is only allocated if the dimensions changed, it is drawn on the next compose
     def set_dimensions(self,dimensions:Coordinate):
+        if tuple(dimensions) == self.get_dimensions():
+            return
+
         self.surface = pygame.Surface(dimensions,*self.surface_args)
+        self.mark_dirty()
 
-        #redraw children to surface on resize
-        self.draw()
+        self.invalidate()
 
     #manually override surface
     def set_surface(self,surface:pygame.Surface):
         self.surface = surface
+        self.mark_dirty()
 
     
     ## GETTERS ###
@@ -38,6 +64,9 @@ class Component:
     
     #used for determining wether collision has occured with window bound positions
     def get_position_relative_to_window(self) -> Coordinate:
+        if self._window_position != None:
+            return self._window_position
+
         left,top = self.get_position()
 
         if self.parent != None:
@@ -45,8 +74,10 @@ class Component:
 
             left += parent_left
             top += parent_top
+
+        self._window_position = (left,top)
         
-        return (left,top)
+        return self._window_position
     
 
     def convert_window_position_to_relative_to_surface(self,window_pos:Coordinate) -> Coordinate:
@@ -59,10 +90,66 @@ class Component:
         )
 
 
+    def _clear_window_position(self):
+        self._window_position = None
+
+        for child in self.children:
+            child._clear_window_position()
+
+
     ## DISPLAY UPDATES ##
 
     #draw should append all children to the surface
     def draw(self):
         #if inherited from Component:
         #print("REDEFINE DRAW FUNCTION IF INHERITING FROM COMPONENT CLASS")
-        pass
\ No newline at end of file
+        pass
+
+    #record that 'rect' of the surface has changed, or all of it if None. whoever blits it next only has to blit
+    #(and push to the display) those areas
+    def mark_dirty(self,rect:pygame.Rect | None = None) -> None:
+        if rect == None:
+            self.dirty_rects = None
+        elif not self.dirty:
+            self.dirty_rects = [pygame.Rect(rect)]
+        elif self.dirty_rects != None:
+            self.dirty_rects.append(pygame.Rect(rect))
+
+        self.dirty = True
+
+    #blit the areas of the surface that changed since it was last blitted onto 'target', at its position.
+    #returns the areas of 'target' blitted to
+    def blit_dirty(self,target:pygame.Surface) -> list[pygame.Rect]:
+        if not self.dirty:
+            return []
+
+        position = self.get_position()
+
+        if self.dirty_rects == None:
+            changed_rects = [target.blit(self.surface,position)]
+        else:
+            changed_rects = [target.blit(self.surface,rect.move(position),area=rect) for rect in self.dirty_rects]
+
+        self.dirty = False
+        self.dirty_rects = None
+
+        return changed_rects
+
+    #mark this component to be redrawn on its next compose. its parents are marked too, as they blit its surface
+    def invalidate(self):
+        component = self
+
+        while component != None:
+            component.invalid = True
+            component = component.parent
+
+    #redraw only if invalidated since the last compose, otherwise the surface is kept as it is. returns True if it was redrawn.
+    #draw should compose the children it blits first, so only invalidated parts of the tree are redrawn
+    def compose(self) -> bool:
+        if not self.invalid:
+            return False
+
+        self.invalid = False
+        self.draw()
+
+        return True
\ No newline at end of file
@@ -90,8 +90,18 @@ class CropOverlay(Component):
         self.handle_rect = pygame.Rect(initial_rect_left,initial_rect_top,initial_rect_handle_w,initial_rect_handle_h)
         self.body_rect = pygame.Rect(initial_rect_left + self.handle_width,initial_rect_top + self.handle_width,initial_rect_body_w,initial_rect_body_h)
 
+        #handle rect as it was last blitted, None if the whole overlay has to be blitted again
+        self.blitted_handle_rect : pygame.Rect | None = None
+
+        self._update_selection_limits()
+
+        self._build_mask()
         self.draw()
 
+        #mouse movement since the last tick, (window_pos,rel). a fast mouse produces many motion events per frame, they are applied together once per tick
+        self._pending_motion : tuple[tuple[int,int],tuple[int,int]] | None = None
+        self.coalesced_motion = 0 #motion events merged into a later one
+
         # self.surface = pygame.Surface((bg_w,bg_h),pygame.SRCALPHA,32) #transparent surface
         
         #drag offset
@@ -142,7 +152,12 @@ class CropOverlay(Component):
 
         return (width,height)
 
-    
+
+    #min / max selection converted to surface dimensions, kept rather than converted on every resizing movement
+    def _update_selection_limits(self) -> None:
+        self.max_selection_surface = self.video_dimension_to_surface_dimension(self.max_selection)
+        self.min_selection_surface = self.video_dimension_to_surface_dimension(self.min_selection)
+
     #generate the position the rectangle should be placed at, factoring in the initial offset, based on the passed pos (typically passed pos will be mouse_pos)
     def _generate_pos_factoring_drag_offset(self,surface_pos:tuple[int,int]) -> tuple[int,int]:        
         return ( surface_pos[0] + self.drag_offset_x , surface_pos[1] + self.drag_offset_y )
@@ -160,11 +175,43 @@ class CropOverlay(Component):
 
     ### DISPLAY MANIPULATION ###
 
-    #draw rectangles to surface
+    #the surface is only the dimmed mask, filled once per resize. the selection is cut out of it when it is blitted (see blit_onto)
+    def _build_mask(self) -> None:
+        self.surface.fill((0,0,0,self.bg_alpha))
+
+    #nothing is redrawn here, the selection is applied when the overlay is next blitted
     def draw(self):
-        self.surface.fill((0,0,0,self.bg_alpha)) #erase previous rects
-        pygame.draw.rect(self.surface,(255,255,255,255),self.handle_rect,width=self.handle_width)
-        pygame.draw.rect(self.surface,(0,0,0,0),self.body_rect)
+        self.dirty = True
+
+    #area of the overlay that has changed since it was last blitted, the old and new selection and the mask in between
+    def get_changed_rect(self) -> pygame.Rect:
+        if self.blitted_handle_rect == None:
+            return self.surface.get_rect()
+
+        return self.blitted_handle_rect.union(self.handle_rect)
+
+    #blit the mask onto 'surface' as four edge rects around the selection, then the selection's border.
+    #the selected area is left untouched, so there is no full size fill or alpha blend per movement
+    def blit_onto(self,surface:pygame.Surface,position:tuple[int,int]) -> None:
+        left,top = position
+        width,height = self.get_dimensions()
+        handle = self.handle_rect
+
+        edges = (
+            pygame.Rect(0,0,width,handle.top), #above
+            pygame.Rect(0,handle.bottom,width,height - handle.bottom), #below
+            pygame.Rect(0,handle.top,handle.left,handle.h), #left
+            pygame.Rect(handle.right,handle.top,width - handle.right,handle.h), #right
+        )
+
+        for edge in edges:
+            if edge.w > 0 and edge.h > 0:
+                surface.blit(self.surface,(left + edge.left,top + edge.top),area=edge)
+
+        pygame.draw.rect(surface,(255,255,255),handle.move(left,top),width=self.handle_width)
+
+        self.blitted_handle_rect = handle.copy()
+        self.dirty = False
     
     #move the selection rectangle to the position specified
     def move_selection_area(self,pos:tuple[int,int]):
@@ -196,6 +243,9 @@ class CropOverlay(Component):
 
         #resize surface
         self.surface = pygame.Surface(xy,pygame.SRCALPHA,32)
+        self._build_mask()
+        self._update_selection_limits()
+        self.blitted_handle_rect = None
 
         
         ## maintain relative position/dimensions of area selection rect
@@ -217,19 +267,45 @@ class CropOverlay(Component):
         self.handle_rect.h = round(y_dim_percentage * self.surface.get_height())
 
         self.combine_rects()
-        self.draw()
+        self.invalidate()
 
 
     def _handle_event(self,event):
         match event.type:
             case pygame.MOUSEBUTTONDOWN:
                 if event.button == 1: #LMB
+                    #movement before the click has to be applied first, it may move the selection under the mouse
+                    self.apply_pending_motion()
                     self._handle_event_lmb_down(event)
             case pygame.MOUSEBUTTONUP:
                 if event.button == 1:
+                    self.apply_pending_motion()
                     self._handle_event_lmb_up(event)
             case pygame.MOUSEMOTION:
-                self._handle_event_mouse_motion(event)
+                self._queue_mouse_motion(event)
+
+    #merge into the movement waiting for the next tick, the newest position wins and the relative movement adds up (resizing follows it)
+    def _queue_mouse_motion(self,event):
+        if self._pending_motion == None:
+            self._pending_motion = (event.pos,event.rel)
+            return
+
+        _,(rel_x,rel_y) = self._pending_motion
+        self._pending_motion = (event.pos,(rel_x + event.rel[0],rel_y + event.rel[1]))
+        self.coalesced_motion += 1
+
+    def apply_pending_motion(self):
+        if self._pending_motion == None:
+            return
+
+        window_pos,rel = self._pending_motion
+        self._pending_motion = None
+
+        self._handle_mouse_motion(window_pos,rel)
+
+    #once per frame, before the overlay is drawn
+    def tick(self):
+        self.apply_pending_motion()
 
 
 
@@ -248,13 +324,12 @@ class CropOverlay(Component):
         if self.is_handle_collide(pos):
             self.is_resizing = True
 
-    #to run on mouse motion event
-    def _handle_event_mouse_motion(self,event):
-        pos = self.convert_window_position_to_relative_to_surface(event.pos)
+    #to run on the mouse movement of a tick
+    def _handle_mouse_motion(self,window_pos:tuple[int,int],rel:tuple[int,int]):
+        pos = self.convert_window_position_to_relative_to_surface(window_pos)
 
         
         ### handle cursor image change
-        original_cursor = pygame.mouse.get_cursor()
         new_cursor = None
         
         use_defualt_cursor_on_no_other_changes = False #false because we want to maintain current cursor if it is being dictated by another portion of the program
@@ -276,7 +351,7 @@ class CropOverlay(Component):
         elif not self.is_hovering_handle and self.is_handle_collide(pos):
             self.is_hovering_handle = True
 
-        if new_cursor != None and new_cursor != original_cursor:
+        if new_cursor != None:
             pygame.mouse.set_cursor(new_cursor)
         elif use_defualt_cursor_on_no_other_changes:
             pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
@@ -318,12 +393,12 @@ class CropOverlay(Component):
             is_top_side_select = (pos[1] - self.handle_rect.top) - ( self.handle_rect.h  / 2) > 0
 
             #get change relative to which direction the user is moving relative to the edges of the rectangle
-            change_x = event.rel[0] if is_right_side_select else event.rel[0] * -1
-            change_y = event.rel[1] if is_top_side_select else event.rel[1] * -1
+            change_x = rel[0] if is_right_side_select else rel[0] * -1
+            change_y = rel[1] if is_top_side_select else rel[1] * -1
 
             
-            max_selection = self.video_dimension_to_surface_dimension(self.max_selection)
-            min_selection = self.video_dimension_to_surface_dimension(self.min_selection)
+            max_selection = self.max_selection_surface
+            min_selection = self.min_selection_surface
 
             min_w = min_selection[0]
             max_w = max_selection[0]
@@ -368,10 +443,14 @@ class CropOverlay(Component):
             self.handle_rect.inflate_ip(0,inflate_by_y)
             self.body_rect.inflate_ip(0,inflate_by_y)
 
+        if not self.is_moving and not self.is_resizing:
+            #only hovering, the selection has not changed
+            return
+
         self.handle_rect.clamp_ip(self.surface.get_rect())
         self.combine_rects()
 
-        self.draw()
+        self.invalidate()
 
 
     #to run on lmb up event
@@ -319,6 +319,16 @@ class Formatter:
         self.parent = Parent(*parent_dimensions)
         self.elements = elements
 
+        #elements by id, for lookups that do not scan every element
+        self._elements_by_id : dict[str,Element] = {}
+        for element in self.elements:
+            self._add_element_id(element)
+
+        #solved layout, built in one pass on first use and thrown away when the parent is resized or an element is added (see _solve)
+        self._row_tops : list[int] | None = None #top of each row, followed by the bottom of the last row
+        self._column_lefts : list[int] | None = None #left of each column, followed by the right of the last column
+        self._layout : dict[str,tuple[tuple[int,int],tuple[int,int]]] | None = None #element id -> (position,dimensions)
+
         # add check for coordinate collisions?
 
         #bind parent object to each element
@@ -371,26 +381,27 @@ class Formatter:
     
     ### USER EXPOSED ###
     
-    #returns the position (<left>,<top>)
+    #returns the dimensions (<width>,<height>)
     def get_dimensions(self,elementID:str):
-        target_elem = self._get_element_by_id(elementID)
+        self._ensure_has_element(elementID)
 
-        return self._get_element_dimensions(target_elem)
+        return self._get_layout()[elementID][1]
     
+    #returns the position (<left>,<top>)
     def get_position(self,elementID:str):
-        target_elem = self._get_element_by_id(elementID)
+        self._ensure_has_element(elementID)
 
-        return self._get_element_position(target_elem)
+        return self._get_layout()[elementID][0]
 
     #to be called when parent 'container' is resized.
     def resize_parent(self,width:int | None = None,height:int | None = None):
         hasChanged = False
         
-        if width != None:
+        if width != None and width != self.parent.width:
             self.parent.width = width
             hasChanged = True
         
-        if height != None:
+        if height != None and height != self.parent.height:
             self.parent.height = height
             hasChanged = True
 
@@ -435,6 +446,8 @@ class Formatter:
         for i in range(temp_element._order[1].start,temp_element._order[1].end + 1):
             temp_element._bind_to_row(self.rows[i])
 
+        self._get_layout()
+
         return self._get_element_position(temp_element)
 
 
@@ -445,21 +458,21 @@ class Formatter:
         if row_index > max_row_index or row_index < 0:
             raise ValueError(f"invalid row index '{row_index}' , maximum row index {max_row_index}")
 
-        row = self.rows[row_index]
+        self._get_layout()
 
-        return row.get_height()
+        return self._row_tops[row_index + 1] - self._row_tops[row_index]
     
 
     #get the width of the column specified
     def get_column_width(self,column_index:int) -> int:
-        max_column_index = len(column_index) -1
+        max_column_index = len(self.columns) -1
 
         if column_index > max_column_index or column_index < 0:
-            raise ValueError(f"invalid row index '{column_index}' , maximum column index {max_column_index}")
+            raise ValueError(f"invalid column index '{column_index}' , maximum column index {max_column_index}")
         
-        column = self.columns[column_index]
+        self._get_layout()
 
-        return column.get_width()
+        return self._column_lefts[column_index + 1] - self._column_lefts[column_index]
     
 
     #add a new element
@@ -475,9 +488,11 @@ class Formatter:
         #bind element to parent
         element._bind_to_parent(self.parent)
 
-
+        self._add_element_id(element)
         self.elements.append(element)
 
+        self._clear_layout()
+
 
 
 
@@ -492,7 +507,40 @@ class Formatter:
 
     #triggers waterfall effect, updating reliant children
     def _update_on_resize(self):
-        pass
+        self._clear_layout()
+
+    #the layout is solved again on next use
+    def _clear_layout(self) -> None:
+        self._row_tops = None
+        self._column_lefts = None
+        self._layout = None
+
+
+    
+    ### LAYOUT ###
+
+    def _get_layout(self) -> dict[str,tuple[tuple[int,int],tuple[int,int]]]:
+        if self._layout == None:
+            self._solve()
+
+        return self._layout
+
+    #solve every row, column and element once. rows and columns are summed into prefix sums,
+    #so the position of an order is two lookups rather than a sum over every row / column before it
+    def _solve(self) -> None:
+        self._row_tops = [0]
+        for row in self.rows:
+            self._row_tops.append(self._row_tops[-1] + row.get_height())
+
+        self._column_lefts = [0]
+        for column in self.columns:
+            self._column_lefts.append(self._column_lefts[-1] + column.get_width())
+
+        layout = {}
+        for element in self.elements:
+            layout[element.id] = (self._get_element_position(element),self._get_element_dimensions(element))
+
+        self._layout = layout
 
 
     
@@ -519,23 +567,9 @@ class Formatter:
             row_span = Span(order[1],spread=0)
 
         
-        column_start = column_span.start
-        
-        row_start = row_span.start
-
-        ## TOP
-        top = 0
-
-        #get all previous rows
-        for row in self.rows[:row_start]:
-            top += row.get_height()
-
-        ## LEFT
-        left = 0
-
-        #all previous columns
-        for column in self.columns[:column_start]:
-            left += column.get_width()
+        #sum of all previous rows / columns, from the prefix sums built by _solve
+        top = self._row_tops[row_span.start]
+        left = self._column_lefts[column_span.start]
     
         return (left,top)
 
@@ -595,12 +629,19 @@ class Formatter:
     
     ### UTILITY ###
     def _get_element_by_id(self,id:str):
-        target_element = next((element for element in self.elements if element.id == id), None)
+        self._ensure_has_element(id)
+
+        return self._elements_by_id[id]
 
-        if target_element == None:
+    def _ensure_has_element(self,id:str) -> None:
+        if id not in self._elements_by_id:
             raise Exception(f"an element with id: '{id}' does not exist.")
-        
-        return target_element
+
+    def _add_element_id(self,element:Element) -> None:
+        if element.id in self._elements_by_id:
+            raise ValueError(f"invalid element id '{element.id}', an element with that id already exists")
+
+        self._elements_by_id[element.id] = element
 
 
 
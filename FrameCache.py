@@ -0,0 +1,62 @@
+import collections
+import numpy as np
+
+
+#decoded frames keyed by frame index, least recently used frames are evicted once the memory budget is exceeded
+class FrameCache:
+    def __init__(self,
+        max_bytes:int = 256 * 1024 * 1024, #memory budget for the cached frames
+    ):
+        if max_bytes < 0:
+            raise ValueError(f"invalid max bytes '{max_bytes}', minimum 0")
+
+        self.max_bytes = max_bytes
+        self.bytes = 0 #bytes currently held
+
+        self._frames : collections.OrderedDict[int,np.ndarray] = collections.OrderedDict() #least recently used first
+
+        self.hits = 0
+        self.misses = 0
+
+
+    ### USER-EXPOSED ###
+
+    #returns the frame, or None if it is not cached
+    def get(self,frame_index:int) -> np.ndarray | None:
+        frame = self._frames.get(frame_index)
+
+        if frame is None:
+            self.misses += 1
+            return None
+
+        self._frames.move_to_end(frame_index)
+        self.hits += 1
+
+        return frame
+
+    #the frame is stored as is, it must not be written to afterwards
+    def put(self,frame_index:int,frame:np.ndarray) -> None:
+        #would evict everything else and still not fit
+        if frame.nbytes > self.max_bytes:
+            return
+
+        if frame_index in self._frames:
+            self.bytes -= self._frames[frame_index].nbytes
+
+        self._frames[frame_index] = frame
+        self._frames.move_to_end(frame_index)
+        self.bytes += frame.nbytes
+
+        while self.bytes > self.max_bytes:
+            _,evicted = self._frames.popitem(last=False)
+            self.bytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        self._frames.clear()
+        self.bytes = 0
+
+    def __contains__(self,frame_index:int) -> bool:
+        return frame_index in self._frames
+
+    def __len__(self) -> int:
+        return len(self._frames)
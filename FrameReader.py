@@ -0,0 +1,339 @@
+import cv2
+import threading
+import collections
+from KeyframeIndex import KeyframeIndex
+
+#when reading backwards with a keyframe index, each group of pictures is decoded forwards from its keyframe once and handed out
+#last frame first. a group whose kept frames would take more memory than this is split into chunks, and every chunk but the first
+#is decoded from the keyframe again: a group split into n chunks costs about n times its length in decodes instead of once
+REVERSE_CHUNK_BYTES = 128 * 1024 * 1024
+
+#frames decoded at a time when reading backwards without a keyframe index, the group boundaries are unknown.
+#each chunk is positioned with CAP_PROP_POS_FRAMES, which decodes from the keyframe before it again
+REVERSE_CHUNK_FRAMES = 24
+
+#while behind, at most this many late frames are skipped in a row before one is decoded anyway.
+#a reader that can not catch up (e.g a slow decoder at 4x) still shows something instead of chasing the due frame forever
+MAX_LATE_SKIPS = 15
+
+
+#decodes frames ahead of the playhead on a background thread, into a bounded buffer. ahead means backwards when reversed.
+#once started, the reader thread is the only thing that may use the VideoCapture.
+class FrameReader(threading.Thread):
+    def __init__(self,
+        video:cv2.VideoCapture,
+        buffer_size:int = 8, #number of decoded frames held ahead of the playhead
+        keyframe_index:KeyframeIndex | None = None, #if given, seeks decode forward from the nearest keyframe instead of using CAP_PROP_POS_FRAMES
+    ):
+        super().__init__(daemon=True)
+
+        if buffer_size < 1:
+            raise ValueError(f"invalid buffer size '{buffer_size}', minimum 1")
+
+        self.video = video
+        self.buffer_size = buffer_size
+        self.keyframe_index = keyframe_index
+
+        self._buffer : collections.deque[tuple[int,object]] = collections.deque() #(frame_index,frame)
+        self._condition = threading.Condition()
+
+        self._next_frame_index = int(self.video.get(cv2.CAP_PROP_POS_FRAMES)) #index of the next frame the reader thread decodes
+        self._frame_bytes = max(1,int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH) * self.video.get(cv2.CAP_PROP_FRAME_HEIGHT) * 3)) #size of a decoded frame
+        self._capture_position = self._next_frame_index #index of the next frame the capture will return, only used by the reader thread
+        self._seek_to : int | None = None #pending seek, picked up by the reader thread
+        self._generation = 0 #incremented on every seek, frames decoded for an older generation are dropped
+
+        self._end_of_video = False #or the start, when reversed
+        self._stopped = False
+        self._reverse = False
+
+        #frame the player is due to show, frames before it (after it, when reversed) are late and skipped without being retrieved
+        self._due_frame : int | None = None
+        self.dropped_frames = 0 #late frames skipped by the reader or discarded by pop_due. frames in between those on the step's cadence are not counted
+
+        #only every nth frame counted from '_step_origin' is decoded, the rest are grabbed (faster than 1x playback shows no more frames than 1x)
+        self._frame_step = 1
+        self._step_origin = self._next_frame_index
+        self._late_skips = 0 #late frames skipped in a row, only used by the reader thread
+
+
+    ### USER-EXPOSED ###
+
+    #returns the next (frame_index,frame), or None if the reader thread has not decoded it yet / the end of the video has been reached
+    def pop(self) -> tuple[int,object] | None:
+        with self._condition:
+            if len(self._buffer) == 0:
+                return None
+
+            item = self._buffer.popleft()
+            self._condition.notify_all() #space to decode into
+
+            return item
+
+    #pops every buffered frame up to and including 'frame_index' (down to, when reversed) and returns the last of them,
+    #the rest are dropped. returns None if no buffered frame is due yet
+    def pop_due(self,frame_index:int) -> tuple[int,object] | None:
+        with self._condition:
+            item = None
+
+            while len(self._buffer) > 0 and (self._buffer[0][0] >= frame_index if self._reverse else self._buffer[0][0] <= frame_index):
+                if item != None:
+                    self.dropped_frames += 1
+
+                item = self._buffer.popleft()
+
+            if item != None:
+                self._condition.notify_all() #space to decode into
+
+            return item
+
+    #the frame the player is due to show, frames the player has already passed are skipped until the next seek
+    def set_due_frame(self,frame_index:int) -> None:
+        with self._condition:
+            self._due_frame = frame_index
+
+    #decode only every 'frame_step'th frame counted from 'origin' (the frame on screen), the frames in between are grabbed without being retrieved
+    def set_frame_step(self,frame_step:int,origin:int) -> None:
+        if frame_step < 1:
+            raise ValueError(f"invalid frame step '{frame_step}', minimum 1")
+
+        with self._condition:
+            self._frame_step = frame_step
+            self._step_origin = origin
+
+    #number of decoded frames ready to be popped
+    def available(self) -> int:
+        with self._condition:
+            return len(self._buffer)
+
+    #returns True once every frame up to the end of the video has been popped
+    def is_end_of_video(self) -> bool:
+        with self._condition:
+            return self._end_of_video and len(self._buffer) == 0 and self._seek_to == None
+
+    #flush the buffer and continue decoding from 'frame_index'
+    def seek(self,frame_index:int) -> None:
+        with self._condition:
+            self._buffer.clear()
+            self._seek_to = frame_index
+            self._step_origin = frame_index
+            self._generation += 1
+            self._end_of_video = False
+            self._due_frame = None
+            self._condition.notify_all()
+
+    #read backwards (or forwards again) from 'frame_index'
+    def set_reverse(self,reverse:bool,frame_index:int) -> None:
+        with self._condition:
+            self._reverse = reverse
+            self.seek(frame_index) #condition is reentrant
+
+    def is_reversed(self) -> bool:
+        return self._reverse
+
+    #seek to 'frame_index' and block until it is decoded, returns (frame_index,frame) or None if it could not be read
+    def seek_and_wait(self,frame_index:int) -> tuple[int,object] | None:
+        self.seek(frame_index)
+
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._buffer) > 0 or (self._end_of_video and self._seek_to == None) or self._stopped)
+
+        return self.pop()
+
+    #the index can be built after the reader has started, it is used from the next seek on
+    def set_keyframe_index(self,keyframe_index:KeyframeIndex | None) -> None:
+        with self._condition:
+            self.keyframe_index = keyframe_index
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        if self.is_alive():
+            self.join()
+
+
+    ### READER THREAD ###
+
+    def run(self) -> None:
+        while True:
+            with self._condition:
+                #wait for space in the buffer, or a seek
+                self._condition.wait_for(lambda: self._stopped or self._seek_to != None or (len(self._buffer) < self.buffer_size and not self._end_of_video))
+
+                if self._stopped:
+                    return
+
+                seek_to = self._seek_to
+                if seek_to != None:
+                    self._seek_to = None
+                    self._next_frame_index = seek_to
+
+                frame_index = self._next_frame_index
+                generation = self._generation
+                keyframe_index = self.keyframe_index
+                due_frame = self._due_frame
+                frame_step = self._frame_step
+                step_origin = self._step_origin
+
+                if self._reverse:
+                    reverse = True
+                else:
+                    reverse = False
+
+                    #the frame sought to is always decoded. otherwise the next frame worth decoding is the due frame if playback is behind,
+                    #rounded up to the next frame on the step's cadence
+                    target = frame_index
+
+                    if seek_to == None:
+                        if due_frame != None and due_frame > target:
+                            target = due_frame
+
+                        if frame_step > 1:
+                            target = step_origin + -(-(target - step_origin) // frame_step) * frame_step
+
+                    #start again from the keyframe before the target rather than decoding every frame up to it, if there is one in between
+                    if target > frame_index and keyframe_index != None:
+                        keyframe = keyframe_index.keyframe_before(target)
+
+                        if keyframe > frame_index:
+                            if due_frame != None:
+                                self.dropped_frames += _count_on_cadence(frame_index,min(keyframe,due_frame),frame_step,step_origin)
+
+                            self._next_frame_index = frame_index = seek_to = keyframe
+
+                    skip = frame_index < target
+
+                    #skipped because playback is behind rather than because of the step (a frame on the cadence that would have been shown)
+                    late = skip and due_frame != None and frame_index < due_frame and (frame_index - step_origin) % frame_step == 0
+
+                    if late and self._late_skips >= MAX_LATE_SKIPS:
+                        skip = late = False
+
+            if reverse:
+                self._read_reverse_chunk(frame_index,due_frame,keyframe_index,generation,frame_step,step_origin)
+                continue
+
+            #decode without holding the lock, so pop / seek never wait on a slow frame
+            if seek_to != None:
+                self._seek(seek_to,keyframe_index,generation)
+
+            if skip:
+                success = self.video.grab()
+                frame = None
+            else:
+                success,frame = self.video.read()
+
+            #-1 when the capture's position is unknown (past the end), so the next seek does not try to decode forward from it
+            self._capture_position = self._capture_position + 1 if success else -1
+
+            with self._condition:
+                #a seek arrived while decoding, this frame is no longer wanted
+                if generation != self._generation:
+                    continue
+
+                if success and skip:
+                    if late:
+                        self.dropped_frames += 1
+                    self._late_skips = self._late_skips + 1 if late else 0
+                    self._next_frame_index += 1
+                elif success:
+                    self._buffer.append((frame_index,frame))
+                    self._late_skips = 0
+                    self._next_frame_index += 1
+                else:
+                    self._end_of_video = True
+
+                self._condition.notify_all()
+
+    #decode the chunk of frames ending at 'end_index' forwards, then buffer them last frame first. the chunk starts at the keyframe
+    #before 'end_index' if there is an index and its frames fit REVERSE_CHUNK_BYTES, so every group is decoded once.
+    #only frames on the step's cadence are retrieved and buffered, the rest are grabbed
+    def _read_reverse_chunk(self,end_index:int,due_frame:int | None,keyframe_index:KeyframeIndex | None,generation:int,frame_step:int = 1,step_origin:int = 0) -> None:
+        #frames after the due frame are late, they are not decoded at all
+        if due_frame != None and due_frame < end_index:
+            with self._condition:
+                if generation != self._generation:
+                    return
+
+                self.dropped_frames += _count_on_cadence(max(due_frame,-1) + 1,end_index + 1,frame_step,step_origin)
+
+                end_index = self._next_frame_index = due_frame
+
+        if keyframe_index != None:
+            #kept frames that fit the budget, every 'frame_step'th frame is kept
+            max_chunk_frames = max(1,REVERSE_CHUNK_BYTES // self._frame_bytes) * frame_step
+            start_index = max(0,keyframe_index.keyframe_before(end_index),end_index - max_chunk_frames + 1)
+        else:
+            start_index = max(0,end_index - REVERSE_CHUNK_FRAMES + 1)
+        frames = []
+
+        if end_index >= 0:
+            self._seek(start_index,keyframe_index,generation)
+
+            while self._capture_position != -1 and self._capture_position <= end_index:
+                #a seek arrived while decoding, this chunk is no longer wanted
+                if generation != self._generation:
+                    return
+
+                if (step_origin - self._capture_position) % frame_step != 0:
+                    success = self.video.grab()
+                else:
+                    success,frame = self.video.read()
+
+                    if success:
+                        frames.append((self._capture_position,frame))
+
+                if not success:
+                    self._capture_position = -1
+                    break
+
+                self._capture_position += 1
+
+        with self._condition:
+            if generation != self._generation:
+                return
+
+            self._buffer.extend(reversed(frames))
+            self._next_frame_index = start_index - 1
+
+            if start_index == 0:
+                self._end_of_video = True
+
+            self._condition.notify_all()
+
+    #position the capture so that the next read returns 'frame_index'
+    def _seek(self,frame_index:int,keyframe_index:KeyframeIndex | None,generation:int) -> None:
+        if keyframe_index == None:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES,frame_index)
+            self._capture_position = frame_index
+            return
+
+        keyframe = keyframe_index.keyframe_before(frame_index)
+
+        #short forward seeks (e.g dragging the play bar forwards) within the same group of pictures: decoding forward is cheaper than seeking
+        if not (keyframe <= self._capture_position <= frame_index):
+            self.video.set(cv2.CAP_PROP_POS_FRAMES,keyframe)
+            self._capture_position = keyframe
+
+        #decode forward to the exact frame, grab skips the colour conversion of the frames we do not keep
+        while self._capture_position < frame_index:
+            #a newer seek has been requested, no point decoding towards this one
+            if generation != self._generation:
+                return
+
+            if not self.video.grab():
+                self._capture_position = -1
+                break
+            self._capture_position += 1
+
+
+#number of frames in [start,end) on the cadence of every 'frame_step'th frame counted from 'step_origin'
+def _count_on_cadence(start:int,end:int,frame_step:int,step_origin:int) -> int:
+    first = step_origin + -(-(start - step_origin) // frame_step) * frame_step
+
+    if first >= end:
+        return 0
+
+    return (end - 1 - first) // frame_step + 1
@@ -0,0 +1,64 @@
+import pygame
+
+
+#characters rendered once into a single surface, text made up of only those characters is then drawn by blitting
+#from it rather than rendering with the font. every glyph gets the same width, so text that changes every frame
+#(e.g a timecode) can be redrawn one changed character at a time without the others moving.
+class GlyphAtlas:
+    def __init__(self,
+        font:pygame.font.Font,
+        characters:str = "0123456789:/ ",
+        colour:tuple[int,int,int] = (255,255,255),
+        bg_colour:tuple[int,int,int] = (0,0,0),
+    ):
+        self.characters = characters
+        self.bg_colour = bg_colour
+
+        glyphs = [font.render(character,True,colour,bg_colour) for character in characters]
+
+        self.glyph_width = max(glyph.get_width() for glyph in glyphs)
+        self.glyph_height = max(glyph.get_height() for glyph in glyphs)
+
+        self.surface = pygame.Surface((self.glyph_width * len(characters),self.glyph_height))
+        self.surface.fill(bg_colour)
+
+        #area of the atlas surface each character is in
+        self._glyph_rects : dict[str,pygame.Rect] = {}
+
+        for i,(character,glyph) in enumerate(zip(characters,glyphs)):
+            cell_left = i * self.glyph_width
+
+            #centred in its cell, narrow characters (e.g ':') get space either side
+            self.surface.blit(glyph,(cell_left + (self.glyph_width - glyph.get_width()) // 2,0))
+            self._glyph_rects[character] = pygame.Rect(cell_left,0,self.glyph_width,self.glyph_height)
+
+
+    ### USER-EXPOSED ###
+
+    def get_text_size(self,text:str) -> tuple[int,int]:
+        return (len(text) * self.glyph_width,self.glyph_height)
+
+    #draw 'text' onto 'surface' at 'position'. if 'previous_text' (the text last drawn there) is given, only the characters
+    #that differ from it are blitted. returns the area of 'surface' drawn on, zero sized if nothing changed
+    def draw_text(self,surface:pygame.Surface,position:tuple[int,int],text:str,previous_text:str | None = None) -> pygame.Rect:
+        left,top = position
+        changed_rect = None
+
+        for i,character in enumerate(text):
+            if previous_text != None and i < len(previous_text) and previous_text[i] == character:
+                continue
+
+            glyph_rect = self._glyph_rects.get(character)
+
+            if glyph_rect == None:
+                raise ValueError(f"invalid character '{character}', not one of the atlas characters '{self.characters}'")
+
+            glyph_dest = surface.blit(self.surface,(left + i * self.glyph_width,top),area=glyph_rect)
+            changed_rect = glyph_dest if changed_rect == None else changed_rect.union(glyph_dest)
+
+        #text got shorter, clear what is left of the previous text
+        if previous_text != None and len(previous_text) > len(text):
+            cleared = surface.fill(self.bg_colour,(left + len(text) * self.glyph_width,top,(len(previous_text) - len(text)) * self.glyph_width,self.glyph_height))
+            changed_rect = cleared if changed_rect == None else changed_rect.union(cleared)
+
+        return changed_rect if changed_rect != None else pygame.Rect(left,top,0,0)
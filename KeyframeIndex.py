@@ -0,0 +1,130 @@
+import os
+import cv2
+import json
+import bisect
+
+
+#version of the sidecar file format, sidecars written with a different version are rebuilt
+SIDECAR_VERSION = 1
+
+
+#keyframe positions of a video, so a seek can start decoding from the nearest keyframe before the wanted frame and
+#decode forward to it, rather than leaving the whole seek to CAP_PROP_POS_FRAMES. positions are packet numbers (decode order),
+#which only match display order exactly on streams without b-frames. the capture is still positioned on the keyframe with
+#CAP_PROP_POS_FRAMES. built by reading the packets without decoding them, and cached in a sidecar file next to the video.
+class KeyframeIndex:
+    def __init__(self,
+        keyframes:list[int], #ascending frame indexes of the keyframes
+        frame_count:int, #number of packets read, more reliable than CAP_PROP_FRAME_COUNT which is an estimate
+        fps:float,
+    ):
+        if len(keyframes) == 0 or keyframes[0] != 0:
+            #the first frame can always be decoded on its own
+            keyframes = [0] + keyframes
+
+        self.keyframes = keyframes
+        self.frame_count = frame_count
+        self.fps = fps
+
+
+    ### USER-EXPOSED ###
+
+    #index of the last keyframe at or before 'frame_index'
+    def keyframe_before(self,frame_index:int) -> int:
+        return self.keyframes[max(0,bisect.bisect_right(self.keyframes,frame_index) - 1)]
+
+
+    ### BUILD ###
+
+    #read every packet of the video without decoding it, returns None if the backend can not read raw packets
+    @staticmethod
+    def build(fp:str) -> "KeyframeIndex | None":
+        video = cv2.VideoCapture(fp,cv2.CAP_FFMPEG,[cv2.CAP_PROP_FORMAT,-1])
+
+        try:
+            if not video.isOpened() or video.get(cv2.CAP_PROP_FORMAT) != -1:
+                return None
+
+            fps = video.get(cv2.CAP_PROP_FPS)
+
+            keyframes = []
+            frame_index = 0
+
+            while video.grab():
+                if video.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframes.append(frame_index)
+                frame_index += 1
+        finally:
+            video.release()
+
+        if frame_index == 0:
+            return None
+
+        return KeyframeIndex(keyframes,frame_index,fps)
+
+    #sidecar if it is up to date, otherwise build (and save) a new index
+    @staticmethod
+    def load_or_build(fp:str) -> "KeyframeIndex | None":
+        index = KeyframeIndex.load(fp)
+
+        if index == None:
+            index = KeyframeIndex.build(fp)
+
+            if index != None:
+                index.save(fp)
+
+        return index
+
+
+    ### SIDECAR ###
+
+    @staticmethod
+    def sidecar_path(fp:str) -> str:
+        return f"{fp}.keyframes.json"
+
+    #returns None if there is no sidecar, or it was written for a different version of the file
+    @staticmethod
+    def load(fp:str) -> "KeyframeIndex | None":
+        try:
+            with open(KeyframeIndex.sidecar_path(fp)) as sidecar_file:
+                sidecar = json.load(sidecar_file)
+
+            if sidecar.get("version") != SIDECAR_VERSION or sidecar.get("source") != source_key(fp):
+                return None
+
+            return KeyframeIndex(sidecar["keyframes"],sidecar["frame_count"],sidecar["fps"])
+        except (OSError,ValueError,KeyError,TypeError):
+            return None
+
+    #written to a temporary file and renamed, so a sidecar on disk is always complete.
+    #failing to write (e.g a read only directory) only means the index is rebuilt next time
+    def save(self,fp:str) -> bool:
+        sidecar_fp = KeyframeIndex.sidecar_path(fp)
+
+        sidecar = {
+            "version": SIDECAR_VERSION,
+            "source": source_key(fp),
+            "frame_count": self.frame_count,
+            "fps": self.fps,
+            "keyframes": self.keyframes,
+        }
+
+        try:
+            with open(f"{sidecar_fp}.tmp","w") as sidecar_file:
+                json.dump(sidecar,sidecar_file)
+
+            os.replace(f"{sidecar_fp}.tmp",sidecar_fp)
+        except OSError:
+            return False
+
+        return True
+
+
+#identifies the version of a file a sidecar was built from (also used by ProxyMedia)
+def source_key(fp:str) -> dict:
+    stat = os.stat(fp)
+
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
@@ -1,4 +1,5 @@
 import pygame
+import assets
 from Button import Button
 from Component import Coordinate,Component
 from events import EVENT_PAUSE,EVENT_PLAY
@@ -13,8 +14,8 @@ class PausePlayButton(Button):
         parent:Component | None = None,
     ):
         state_displays = {
-            1:pygame.image.load("media\\play.png"),
-            2:pygame.image.load("media\\pause.png")
+            1:assets.load_image("media\\play.png"),
+            2:assets.load_image("media\\pause.png")
         }
         #State 1: paused
         #state 2: playing
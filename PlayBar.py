@@ -1,9 +1,18 @@
 import pygame
+import time
+import assets
 from Formatter import Formatter,Element,Percentage,Span,AspectMultiplier
 from Component import Component,Coordinate
 from PausePlayButton import PausePlayButton
+from GlyphAtlas import GlyphAtlas
 
-from events import EVENT_FRAME_SKIP,PostEvent_FrameSkip
+from events import EVENT_FRAME_SKIP,PostEvent_FrameSkip,EVENT_EXPORT_PROGRESS,EVENT_EXPORT_COMPLETE,EVENT_EXPORT_CANCELLED,EVENT_EXPORT_FAILED
+
+#how close (in pixels) the mouse has to be to a trim marker to drag it
+TRIM_MARKER_GRAB_DISTANCE = 6
+
+#the dropped frame count can change on every tick while playback is behind, its text is re-rendered at most this often
+DROPPED_FRAMES_REDRAW_SECONDS = 0.5
 
 #TODO
 #PLAN
@@ -60,6 +69,18 @@ class PlayBar(Component):
             height=Percentage(0.4),
         )
 
+        #sits underneath the progress bar, only drawn while an export is running
+        self.element_export_bar = Element(
+            "export_bar",
+            order=(2,1),
+            width=Percentage(1),
+            height=Percentage(0.08),
+            margin={
+                "bottom":Percentage(0.1),
+                "left":Percentage(0),
+            },
+        )
+
         self.formatter = Formatter(
             parent_dimensions=dimensions,
             rows=[
@@ -74,6 +95,7 @@ class PlayBar(Component):
             elements=[
                 self.element_pauseplay,
                 self.element_progress_bar,
+                self.element_export_bar,
             ]
         )
 
@@ -82,23 +104,24 @@ class PlayBar(Component):
         #timestamp element is defined after formatter initialisation, because the height of the element (the font size) is dependant on the height of the row
         #which is calculated within formatter init
     
-        if not pygame.font.get_init(): #initiliase pygame font module if not already initiliased.
-            pygame.font.init()
-
         _timestamp_order = (2,0) #column 1, row 0
 
         timestamp_row_height = self.formatter.get_row_height(_timestamp_order[1])
 
         timestamp_font_size = round(timestamp_row_height * 0.6)
 
-        timestamp_font = pygame.font.Font("fonts\\arial.ttf",timestamp_font_size)
+        self.font_timestamp = assets.load_font("fonts\\arial.ttf",timestamp_font_size)
 
-        timestamp_text = self.milliseconds_to_timestamp(self.get_video_length())
-        timestamp_text_colour = (255,255,255)
+        self.timestamp_text_colour = (255,255,255)
 
-        self.surface_timestamp = timestamp_font.render(timestamp_text,True,timestamp_text_colour,self.bg_colour)
+        #the timestamp is "current / total" and changes every frame, it is drawn from pre-rendered glyphs rather than rendered with the font
+        self.glyph_atlas = GlyphAtlas(self.font_timestamp,colour=self.timestamp_text_colour,bg_colour=self.bg_colour)
 
-        timestamp_width,timestamp_height = self.surface_timestamp.get_rect()[:2]
+        self.timestamp_total_text = self.milliseconds_to_timestamp(self.get_video_length())
+        self.timestamp_text = self._gen_timestamp_text()
+        self.timestamp_drawn_text : str | None = None #text currently on the surface, None if it has to be drawn in full
+
+        timestamp_width,timestamp_height = self.glyph_atlas.get_text_size(self.timestamp_text)
 
 
         self.element_timestamp = Element(
@@ -128,9 +151,28 @@ class PlayBar(Component):
         
         self.rect_progress_container = pygame.Rect(*progress_bar_rect_pos,*progress_bar_rect_dim)
 
+        #export progress
+        self.export_progress : tuple[int,int,float] | None = None #(frames_done,frame_count,fps), None when no export is running
+        self.surface_export_status : pygame.Surface | None = None
+
+        #frames dropped by the player to keep up with the media clock, shown in place of the export status while there is none
+        self.dropped_frames = 0 #count currently shown, lags the player's count by up to DROPPED_FRAMES_REDRAW_SECONDS
+        self.dropped_frames_time = 0 #time.perf_counter() the count shown was last set
+        self.surface_dropped_frames : pygame.Surface | None = None
+        self.rect_status : pygame.Rect | None = None #area of the surface the export status / dropped frames were last drawn in
+        self.rect_export_bar_container = pygame.Rect(*self.formatter.get_position("export_bar"),*self.formatter.get_dimensions("export_bar"))
+        self.rect_export_bar = pygame.Rect(*self.rect_export_bar_container.topleft,0,self.rect_export_bar_container.h)
+
+        #trim, only frames [trim_in_frame,trim_out_frame) are exported
+        self.trim_in_frame = 0
+        self.trim_out_frame = int(self.frame_count)
+
         #if playbar is being dragged by user
         self.isDraggingBar = False
 
+        #trim marker being dragged by user, "in" / "out" or None
+        self.draggingTrimMarker : str | None = None
+
 
 
 
@@ -141,12 +183,20 @@ class PlayBar(Component):
     
     ### display changes ###
 
-    #to be ran on each tick
-    def tick(self,video_is_playing:bool) -> None:
-        if video_is_playing:
-            self.next_frame(draw=False)
-        
-        self.draw()
+    #to be ran on each tick, with the index of the frame the player is showing (and its frame count, which can be corrected during playback)
+    def tick(self,frame_index:int,dropped_frames:int = 0,frame_count:int | None = None) -> None:
+        if frame_count != None and frame_count != self.frame_count:
+            self.set_frame_count(frame_count)
+
+        if frame_index != self.current_frame_index and frame_index >= 0:
+            self.set_current_frame_index(frame_index)
+
+        #going back to none is shown straight away
+        if dropped_frames != self.dropped_frames and (dropped_frames == 0 or time.perf_counter() - self.dropped_frames_time >= DROPPED_FRAMES_REDRAW_SECONDS):
+            self.set_dropped_frames(dropped_frames)
+
+        #redraw once, however many changes there were since the last tick (including the button changing state)
+        self.compose()
 
 
 
@@ -155,17 +205,49 @@ class PlayBar(Component):
         self.surface.fill(self.bg_colour)
         
         #pauseplay button
+        self.component_pauseplay_button.compose()
         self.surface.blit(self.component_pauseplay_button.surface,self.component_pauseplay_button.get_position())
+        self.component_pauseplay_button.dirty = False
         
         #timestamp
-        self.surface.blit(self.surface_timestamp,self.formatter.get_position("timestamp"))
+        self.glyph_atlas.draw_text(self.surface,self.formatter.get_position("timestamp"),self.timestamp_text)
+        self.timestamp_drawn_text = self.timestamp_text
 
 
         #progress bar
         pygame.draw.rect(self.surface,(255,255,255),self.rect_progress_container)
+
+        #trim, shade the parts of the video that will not be exported (under the progress, so the playhead stays visible outside the trim) and mark the in / out points
+        trim_in_x = self._get_x_on_playbar_of_frame(self.trim_in_frame)
+        trim_out_x = self._get_x_on_playbar_of_frame(self.trim_out_frame)
+
+        container = self.rect_progress_container
+        pygame.draw.rect(self.surface,(90,90,100),(container.left,container.top,trim_in_x - container.left,container.h))
+        pygame.draw.rect(self.surface,(90,90,100),(trim_out_x,container.top,container.right - trim_out_x,container.h))
+
         pygame.draw.rect(self.surface,(110,150,200),self.rect_progress_bar)
+
+        pygame.draw.line(self.surface,(255,200,60),(trim_in_x,container.top),(trim_in_x,container.bottom - 1),width=3)
+        pygame.draw.line(self.surface,(255,200,60),(trim_out_x,container.top),(trim_out_x,container.bottom - 1),width=3)
+
         pygame.draw.rect(self.surface,(200,200,200),self.rect_progress_container,width=self._get_outline_width())
 
+        #export progress
+        if self.export_progress != None:
+            pygame.draw.rect(self.surface,(60,60,70),self.rect_export_bar_container)
+            pygame.draw.rect(self.surface,(120,200,120),self.rect_export_bar)
+
+        #export progress, or why the last export failed
+        self.rect_status = None
+
+        if self.surface_export_status != None:
+            self.rect_status = self._blit_status(self.surface_export_status)
+
+        elif self.surface_dropped_frames != None:
+            self.rect_status = self._blit_status(self.surface_dropped_frames)
+
+        self.mark_dirty()
+
 
 
     def resize(self,xy:tuple[int,int]):
@@ -193,25 +275,166 @@ class PlayBar(Component):
 
         self.rect_progress_container = pygame.Rect(*progress_bar_rect_pos,*progress_bar_rect_dim)
 
-        self.draw()
+        #export bar rect
+        self.rect_export_bar_container = pygame.Rect(*self.formatter.get_position("export_bar"),*self.formatter.get_dimensions("export_bar"))
+        self.rect_export_bar = pygame.Rect(*self.rect_export_bar_container.topleft,0,self.rect_export_bar_container.h)
+        self.update_export_bar()
+
+        self.invalidate()
+
+    #returns True if the width of the bar changed
+    def update_progress_bar(self) -> bool:
+        width = int(round(self.rect_progress_container.w * self.get_progress_percentage()))
+
+        if width == self.rect_progress_bar.w:
+            return False
+
+        self.rect_progress_bar.w = width
+        return True
+
+    def update_export_bar(self):
+        if self.export_progress == None:
+            return
 
-    def update_progress_bar(self):
-        self.rect_progress_bar.w = int(round(self.rect_progress_container.w * self.get_progress_percentage()))
+        frames_done,frame_count,fps = self.export_progress
+
+        export_percentage = min(1,frames_done / frame_count) if frame_count > 0 else 0
+
+        self.rect_export_bar.w = int(round(self.rect_export_bar_container.w * export_percentage))
+
+        status_text = f"exporting {round(export_percentage * 100)}% ({frames_done}/{frame_count}, {fps:.0f} fps) - esc to cancel"
+        self.surface_export_status = self.font_timestamp.render(status_text,True,self.timestamp_text_colour,self.bg_colour)
+
+
+    #status text goes above the progress bar, on its own line below the timestamp (which is redrawn on its own every frame and would
+    #blit over anything it shares the row with). text wider than the progress bar is cut off rather than running past it
+    def _blit_status(self,surface:pygame.Surface) -> pygame.Rect:
+        max_width = self.rect_progress_container.w
+        width,height = min(surface.get_width(),max_width),surface.get_height()
+
+        status_pos = self.formatter.gen_dynamic_rect_position(
+            rect_dimensions=(width,height),
+            order=(2,1),
+            margin_right=0,
+            margin_top=0,
+        )
+
+        return self.surface.blit(surface,status_pos,area=(0,0,width,height))
 
 
     ### setters ###
 
     def set_current_frame_index(self,index) -> None:
-        if index > self.frame_count or index < 0:
-            raise Exception(f"cannot set frame index to a frame greater than the frame count. Tried setting index '{index}' , frame-count: '{self.frame_count}'")
-        
+        if index < 0:
+            raise Exception(f"cannot set frame index to a negative frame. Tried setting index '{index}' , frame-count: '{self.frame_count}'")
+
+        #the player has shown a frame past the end, the container under-reported the frame count
+        if index > self.frame_count:
+            self.set_frame_count(index + 1)
+
         self.current_frame_index = index
+
+        #on a long video most frames do not move the bar by a whole pixel
+        if self.update_progress_bar():
+            self.invalidate()
+
+        self.update_timestamp()
+
+    #the timestamp changes on almost every frame. unless the whole bar is being redrawn anyway, only the characters that changed are blitted
+    def update_timestamp(self) -> None:
+        timestamp_text = self._gen_timestamp_text()
+
+        if timestamp_text == self.timestamp_text:
+            return
+
+        self.timestamp_text = timestamp_text
+
+        if self.invalid or self.timestamp_drawn_text == None:
+            return
+
+        changed_rect = self.glyph_atlas.draw_text(self.surface,self.formatter.get_position("timestamp"),timestamp_text,previous_text=self.timestamp_drawn_text)
+        self.timestamp_drawn_text = timestamp_text
+        self.mark_dirty(changed_rect)
+
+    #the frame count given to the constructor is usually CAP_PROP_FRAME_COUNT, which is only an estimate for many containers
+    def set_frame_count(self,frame_count:int) -> None:
+        if frame_count == self.frame_count:
+            return
+
+        #an out point at the end of the video stays at the end
+        if self.trim_out_frame >= int(self.frame_count):
+            self.trim_out_frame = int(frame_count)
+
+        self.frame_count = frame_count
+
+        self.trim_out_frame = min(self.trim_out_frame,int(frame_count))
+        self.trim_in_frame = max(0,min(self.trim_in_frame,self.trim_out_frame - 1))
+        self.current_frame_index = min(self.current_frame_index,int(frame_count))
+
+        self.timestamp_total_text = self.milliseconds_to_timestamp(self.get_video_length())
+        self.timestamp_text = self._gen_timestamp_text()
+
         self.update_progress_bar()
-        self.draw()
+        self.invalidate()
+
+    #set trim in point, must be before the out point
+    def set_trim_in_frame(self,index:int) -> None:
+        self.trim_in_frame = max(0,min(index,self.trim_out_frame - 1))
+        self.invalidate()
+
+    #set trim out point (the frame export stops before), must be after the in point
+    def set_trim_out_frame(self,index:int) -> None:
+        self.trim_out_frame = min(int(self.frame_count),max(index,self.trim_in_frame + 1))
+        self.invalidate()
+
+    def set_dropped_frames(self,dropped_frames:int) -> None:
+        self.dropped_frames = dropped_frames
+        self.dropped_frames_time = time.perf_counter()
+
+        if dropped_frames > 0:
+            self.surface_dropped_frames = self.font_timestamp.render(f"{dropped_frames} frames dropped",True,self.timestamp_text_colour,self.bg_colour)
+        else:
+            self.surface_dropped_frames = None
+
+        #hidden behind the export status, or the whole bar is being redrawn anyway
+        if self.surface_export_status != None or self.invalid:
+            return
+
+        #only the status line changed, clear the old count and draw the new one rather than redrawing the whole bar
+        if self.rect_status != None:
+            self.surface.fill(self.bg_colour,self.rect_status)
+            self.mark_dirty(self.rect_status)
+            self.rect_status = None
+
+        if self.surface_dropped_frames != None:
+            self.rect_status = self._blit_status(self.surface_dropped_frames)
+            self.mark_dirty(self.rect_status)
+
+    #set export progress as (frames_done,frame_count,fps), or None to hide the export bar
+    def set_export_progress(self,export_progress:tuple[int,int,float] | None) -> None:
+        self.export_progress = export_progress
+
+        if export_progress == None:
+            self.surface_export_status = None
+
+        self.update_export_bar()
+        self.invalidate()
+
+    #hide the export bar and show why the export failed, until the next export starts
+    def set_export_failed(self,error:Exception) -> None:
+        self.export_progress = None
+        self.surface_export_status = self.font_timestamp.render(f"export failed: {error}",True,(255,110,110),self.bg_colour)
+
+        self.invalidate()
 
     
     ### getters ###
 
+    #returns (start_frame,end_frame) of the trimmed range, end_frame is None if it is the end of the video
+    def get_trim(self) -> tuple[int,int | None]:
+        end_frame = self.trim_out_frame if self.trim_out_frame < int(self.frame_count) else None
+        return (self.trim_in_frame,end_frame)
+
     def _get_outline_width(self) -> int:
         max_val = 3
         min_val = 1
@@ -232,12 +455,23 @@ class PlayBar(Component):
         #custom
         if event.type == EVENT_FRAME_SKIP:
             self.set_current_frame_index(event.frame_index)
+
+        elif event.type == EVENT_EXPORT_PROGRESS:
+            self.set_export_progress((event.frames_done,event.frame_count,event.fps))
+
+        elif event.type in (EVENT_EXPORT_COMPLETE,EVENT_EXPORT_CANCELLED):
+            self.set_export_progress(None)
+
+        elif event.type == EVENT_EXPORT_FAILED:
+            self.set_export_failed(event.error)
         
         #vanilla
         else:
             match event.type:
                 case pygame.VIDEORESIZE:
                     self.resize((event.w,event.h))
+                case pygame.KEYDOWN:
+                    self._handle_event_key_down(event)
                 case pygame.MOUSEBUTTONDOWN:
                     if event.button == 1: #LMB
                         self._handle_event_lmb_down(event)
@@ -248,10 +482,25 @@ class PlayBar(Component):
                     self._handle_event_mousemotion(event)
 
     
+    # KEYBOARD
+
+    def _handle_event_key_down(self,event):
+        #set trim in / out points at the current frame
+        if event.key == pygame.K_i:
+            self.set_trim_in_frame(self.current_frame_index)
+        elif event.key == pygame.K_o:
+            self.set_trim_out_frame(self.current_frame_index)
+
+
     # MOUSE
     
     def _handle_event_lmb_down(self,event):        
-        if self.playbar_is_hovered(event):
+        #trim markers take priority over seeking, as they sit on top of the bar
+        trim_marker = self._get_trim_marker_at(event)
+        if trim_marker != None:
+            self.draggingTrimMarker = trim_marker
+
+        elif self.playbar_is_hovered(event):
             if not self.isDraggingBar:
                 self.isDraggingBar = True
 
@@ -264,11 +513,21 @@ class PlayBar(Component):
         if self.isDraggingBar:
             self.isDraggingBar = False
 
+        self.draggingTrimMarker = None
+
     def _handle_event_mousemotion(self,event):
-        if self.isDraggingBar:
+        if self.draggingTrimMarker != None:
+            frame_index = self.frame_indx_at_milliseconds(self.get_ms_on_playbar_selection(event))
+
+            if self.draggingTrimMarker == "in":
+                self.set_trim_in_frame(frame_index)
+            else:
+                self.set_trim_out_frame(frame_index)
+
+        elif self.isDraggingBar:
             jump_to_ms = self.get_ms_on_playbar_selection(event)
             jump_to_frame_index = self.frame_indx_at_milliseconds(jump_to_ms)
-            pygame.event.post(PostEvent_FrameSkip(jump_to_frame_index).event())
+            pygame.event.post(PostEvent_FrameSkip(jump_to_frame_index,preview=True).event())
 
 
 
@@ -280,6 +539,25 @@ class PlayBar(Component):
 
     def playbar_is_hovered(self,event:pygame.event.Event) -> bool:
         return self.rect_progress_container.collidepoint(self.convert_window_position_to_relative_to_surface(event.pos))
+
+    #returns "in" / "out" if the event is over that trim marker, otherwise None
+    def _get_trim_marker_at(self,event:pygame.event.Event) -> str | None:
+        x,y = self.convert_window_position_to_relative_to_surface(event.pos)
+
+        if y < self.rect_progress_container.top or y > self.rect_progress_container.bottom:
+            return None
+
+        #out checked first, so when the markers overlap dragging right separates them
+        if abs(x - self._get_x_on_playbar_of_frame(self.trim_out_frame)) <= TRIM_MARKER_GRAB_DISTANCE:
+            return "out"
+        elif abs(x - self._get_x_on_playbar_of_frame(self.trim_in_frame)) <= TRIM_MARKER_GRAB_DISTANCE:
+            return "in"
+
+        return None
+
+    #x position (relative to surface) of the given frame on the progress bar
+    def _get_x_on_playbar_of_frame(self,frame_indx:int) -> int:
+        return self.rect_progress_container.left + round(self.rect_progress_container.w * (frame_indx / self.frame_count))
     
 
 
@@ -346,6 +624,10 @@ class PlayBar(Component):
 
         return f"{hours:02d}:{minutes:02d}:{seconds:02d}:{milliseconds:03d}"
     
+    #"<current> / <total>"
+    def _gen_timestamp_text(self) -> str:
+        return f"{self.milliseconds_to_timestamp(self.milliseconds_time_from_frame(self.current_frame_index))} / {self.timestamp_total_text}"
+    
     #return frame indx at a given millseconds
     def frame_indx_at_milliseconds(self,milliseconds:int) -> int:
         frame_duration = self.get_duration_per_frame()
@@ -367,7 +649,7 @@ class PlayBar(Component):
             self.set_current_frame_index(self.current_frame_index + 1)
 
         if draw:
-            self.draw()
+            self.invalidate()
     
 
 
@@ -0,0 +1,126 @@
+import os
+import cv2
+import json
+import threading
+from typing import Callable
+from KeyframeIndex import source_key
+from export import resolve_fourcc
+
+
+#version of the proxy file format, proxies written with a different version are rebuilt
+PROXY_VERSION = 1
+
+
+#transcodes a low resolution copy of a video on a background thread and caches it next to the video, for playing back
+#sources too large to decode and downscale at their frame rate. the proxy is motion jpeg where supported, every frame
+#is a keyframe so seeking in it is cheap. it only ever replaces the source for display, crop selections and exports
+#stay in the source's coordinates and read the source file.
+class ProxyMedia(threading.Thread):
+    def __init__(self,
+        fp:str,
+        height:int = 540, #proxy height, the width follows the video's aspect ratio
+        on_ready:Callable[[str],None] | None = None, #called from the worker thread with the proxy's path once it is complete
+    ):
+        super().__init__(daemon=True)
+
+        self.fp = fp
+        self.height = height
+        self.on_ready = on_ready
+
+        self.proxy_fp = ProxyMedia.proxy_path(fp,height)
+
+        self._stop_event = threading.Event()
+
+
+    ### USER-EXPOSED ###
+
+    @staticmethod
+    def proxy_path(fp:str,height:int) -> str:
+        return f"{fp}.proxy{height}.avi"
+
+    #path of the cached proxy if it is complete and was built from the current version of the file, otherwise None
+    @staticmethod
+    def load(fp:str,height:int = 540) -> str | None:
+        proxy_fp = ProxyMedia.proxy_path(fp,height)
+
+        try:
+            with open(f"{proxy_fp}.json") as sidecar_file:
+                sidecar = json.load(sidecar_file)
+        except (OSError,ValueError):
+            return None
+
+        if sidecar.get("version") != PROXY_VERSION or sidecar.get("source") != source_key(fp) or not os.path.exists(proxy_fp):
+            return None
+
+        return proxy_fp
+
+    #True if the source is tall enough for a proxy to be worth building
+    @staticmethod
+    def is_worthwhile(video:cv2.VideoCapture,height:int = 540) -> bool:
+        return video.get(cv2.CAP_PROP_FRAME_HEIGHT) > height
+
+    #stop transcoding, the partial proxy is removed
+    def stop(self) -> None:
+        self._stop_event.set()
+
+        if self.is_alive():
+            self.join()
+
+
+    ### WORKER ###
+
+    def run(self) -> None:
+        root,extension = os.path.splitext(self.proxy_fp)
+        partial_fp = f"{root}.partial{extension}"
+
+        video = cv2.VideoCapture(self.fp)
+        out = None
+
+        try:
+            v_width = video.get(cv2.CAP_PROP_FRAME_WIDTH)
+            v_height = video.get(cv2.CAP_PROP_FRAME_HEIGHT)
+
+            #even dimensions, some codecs will not encode odd ones
+            proxy_dimensions = (max(2,round(self.height * v_width / v_height / 2) * 2),self.height)
+
+            out = cv2.VideoWriter(partial_fp,cv2.VideoWriter.fourcc(*resolve_fourcc("MJPG",partial_fp)),video.get(cv2.CAP_PROP_FPS),proxy_dimensions)
+
+            if not out.isOpened():
+                raise Exception(f"could not open video writer for '{partial_fp}'.")
+
+            proxy_frame = None
+
+            while not self._stop_event.is_set():
+                success,frame = video.read()
+
+                if not success:
+                    break
+
+                proxy_frame = cv2.resize(frame,proxy_dimensions,dst=proxy_frame,interpolation=cv2.INTER_AREA)
+                out.write(proxy_frame)
+
+            #the proxy is only complete once its writer is released
+            out.release()
+
+            if self._stop_event.is_set():
+                return
+
+            os.replace(partial_fp,self.proxy_fp)
+
+            with open(f"{self.proxy_fp}.json","w") as sidecar_file:
+                json.dump({"version": PROXY_VERSION,"source": source_key(self.fp)},sidecar_file)
+        except Exception:
+            #e.g a read only directory, or no codec this OpenCV build can write. playback carries on from the source
+            return
+        finally:
+            video.release()
+
+            if out != None:
+                out.release()
+
+            #stopped or failed, once the writer is released
+            if os.path.exists(partial_fp):
+                os.remove(partial_fp)
+
+        if self.on_ready != None:
+            self.on_ready(self.proxy_fp)
@@ -0,0 +1,81 @@
+import cv2
+import math
+import threading
+import numpy as np
+
+
+#builds small copies of every nth frame of a video on a background thread, so that dragging along the play bar can show
+#something straight away instead of waiting on a full resolution seek and decode for every mouse movement
+class ProxyStrip(threading.Thread):
+    def __init__(self,
+        fp:str,
+        max_proxies:int = 600, #the step between proxies is chosen so that no more than this many are built
+        proxy_width:int = 160, #height follows the video's aspect ratio
+    ):
+        super().__init__(daemon=True)
+
+        #own capture, the player's capture belongs to its frame reader
+        self.video = cv2.VideoCapture(fp)
+
+        if self.video.isOpened() == False:
+            raise Exception(f"video '{fp}' could not be opened.")
+
+        frame_count = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+        v_width = self.video.get(cv2.CAP_PROP_FRAME_WIDTH)
+        v_height = self.video.get(cv2.CAP_PROP_FRAME_HEIGHT)
+
+        self.step = max(1,math.ceil(frame_count / max_proxies)) #frames between proxies
+        self.proxy_dimensions = (proxy_width,max(1,round(proxy_width * v_height / v_width)))
+
+        #one contiguous array rather than a list of small arrays
+        self.proxies = np.zeros((math.ceil(frame_count / self.step),self.proxy_dimensions[1],self.proxy_dimensions[0],3),dtype=np.uint8)
+        self.built = 0 #proxies are built in order, proxies[:built] are ready
+
+        self._stop_event = threading.Event()
+
+
+    ### USER-EXPOSED ###
+
+    #returns (frame_index,proxy) of the proxy closest to 'frame_index', or None if it has not been built yet.
+    #the last built proxy may be far from 'frame_index' while the strip is still being built, the caller seeks instead
+    def nearest(self,frame_index:int) -> tuple[int,np.ndarray] | None:
+        proxy_index = max(0,min(round(frame_index / self.step),len(self.proxies) - 1))
+
+        if proxy_index >= self.built:
+            return None
+
+        return (proxy_index * self.step,self.proxies[proxy_index])
+
+    def is_complete(self) -> bool:
+        return self.built == len(self.proxies)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+        if self.is_alive():
+            self.join()
+
+
+    ### WORKER ###
+
+    def run(self) -> None:
+        frame_index = 0
+
+        try:
+            while self.built < len(self.proxies) and not self._stop_event.is_set():
+                #only every nth frame is kept, grab skips the colour conversion of the rest
+                if frame_index % self.step != 0:
+                    if not self.video.grab():
+                        break
+                else:
+                    success,frame = self.video.read()
+
+                    if not success:
+                        break
+
+                    cv2.resize(frame,self.proxy_dimensions,dst=self.proxies[self.built],interpolation=cv2.INTER_AREA)
+                    self.built += 1
+
+                frame_index += 1
+        finally:
+            self.video.release()
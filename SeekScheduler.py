@@ -0,0 +1,72 @@
+import time
+import collections
+
+
+#holds the newest requested seek only. a fast drag along the play bar requests a seek for every mouse movement,
+#by the time one is served the older ones are no longer wanted, so they are replaced rather than queued.
+class SeekScheduler:
+    def __init__(self,
+        latency_samples:int = 100, #number of recent latencies kept for get_latency_stats
+    ):
+        self._pending : tuple[int,bool,float] | None = None #(frame_index,preview,requested_at)
+
+        #requested_at of the newest seek, kept until its exact frame is shown
+        self._last_requested_at : float | None = None
+
+        self.requested = 0
+        self.coalesced = 0 #requests replaced by a newer one before they were served
+
+        self.latencies : collections.deque[float] = collections.deque(maxlen=latency_samples) #seconds from the newest request to its exact frame being shown
+        self.last_latency : float | None = None
+
+
+    ### USER-EXPOSED ###
+
+    #replaces any seek that has not been served yet
+    def request(self,frame_index:int,preview:bool = False,requested_at:float | None = None) -> None:
+        if self._pending != None:
+            self.coalesced += 1
+
+        self.requested += 1
+
+        if requested_at == None:
+            requested_at = time.perf_counter()
+
+        self._pending = (frame_index,preview,requested_at)
+        self._last_requested_at = requested_at
+
+    #returns (frame_index,preview) of the seek to serve, or None if there is none. the seek is removed
+    def take(self) -> tuple[int,bool] | None:
+        if self._pending == None:
+            return None
+
+        frame_index,preview,_ = self._pending
+        self._pending = None
+
+        return (frame_index,preview)
+
+    def has_pending(self) -> bool:
+        return self._pending != None
+
+    #to be called once the exact frame of the newest seek is on screen
+    def record_shown(self) -> None:
+        if self._last_requested_at == None:
+            return
+
+        self.last_latency = time.perf_counter() - self._last_requested_at
+        self.latencies.append(self.last_latency)
+        self._last_requested_at = None
+
+    #latency of recent seeks in milliseconds, None if no seeks have been shown yet
+    def get_latency_stats(self) -> dict | None:
+        if len(self.latencies) == 0:
+            return None
+
+        latencies_ms = sorted(latency * 1000 for latency in self.latencies)
+
+        return {
+            "samples": len(latencies_ms),
+            "mean_ms": sum(latencies_ms) / len(latencies_ms),
+            "max_ms": latencies_ms[-1],
+            "last_ms": self.last_latency * 1000,
+        }
@@ -1,7 +1,16 @@
 import pygame
 import cv2
+import threading
+import assets
 from VideoPlayer import VideoPlayer
 from PlayBar import PlayBar
+from VideoExporter import VideoExporter
+from KeyframeIndex import KeyframeIndex
+from ProxyStrip import ProxyStrip
+from ProxyMedia import ProxyMedia
+from export import keep_every_for_fps,resolve_fourcc,DEFAULT_CODEC
+
+from events import EVENT_EXPORT_PROGRESS,EVENT_EXPORT_COMPLETE,EVENT_EXPORT_CANCELLED,EVENT_EXPORT_FAILED,EVENT_PROXY_READY,PostEvent_ProxyReady
 
 def main():
     v = VideoCropper("sample.mp4")
@@ -16,6 +25,9 @@ class VideoCropper:
                  bg_colour:tuple[int,int,int]=(100,100,120),
                  window_start_dimensions:tuple[int,int] = (1200,800),
                  crop_aspect_ratio:float | None = None,
+                 out_fps:float | None = None, #drop frames on export to get as close as possible to this fps, None keeps every frame
+                 codec:str = DEFAULT_CODEC, #fourcc or export.CODEC_PRESETS name, e.g "fast" / "small"
+                 proxy_height:int | None = None, #play back a lower resolution copy of the video (transcoded in the background the first time, then cached next to it). for sources too large to play at their frame rate
         ) -> None:
         self.video = cv2.VideoCapture(fp)
 
@@ -39,38 +51,82 @@ class VideoCropper:
         pygame.display.set_caption(fp)
 
         #set icon
-        icon = pygame.image.load("media\\icon.png")
+        icon = assets.load_image("media\\icon.png")
         pygame.display.set_icon(icon)
 
 
+        #proxy media, the source is played back until the proxy is ready. exports always read the source
+        proxy_fp = None
+        self.proxy_media : ProxyMedia | None = None
+
+        #video played back, the source or its proxy
+        self.playback_video = self.video
+
+        if proxy_height != None and ProxyMedia.is_worthwhile(self.video,proxy_height):
+            proxy_fp = ProxyMedia.load(fp,proxy_height)
+
+            if proxy_fp != None:
+                proxy_video = cv2.VideoCapture(proxy_fp)
+
+                #a cached proxy that will not open is rebuilt, the source is played back until then
+                if proxy_video.isOpened() == False:
+                    proxy_fp = None
+                else:
+                    self.playback_video = proxy_video
+                    self.video.release()
+
+            if proxy_fp == None:
+                self.proxy_media = ProxyMedia(fp,proxy_height,on_ready=lambda proxy_fp: pygame.event.post(PostEvent_ProxyReady(proxy_fp).event()))
+                self.proxy_media.start()
+
+        #low resolution frames for dragging along the play bar, built in the background
+        self.proxy_strip = ProxyStrip(proxy_fp if proxy_fp != None else fp)
+        self.proxy_strip.start()
+
         #video player
         self.video_player = VideoPlayer(
             dimensions=(self.gen_dimensions_video_surface()),
             position=self.gen_position_video_surface(),
-            video=self.video,
+            video=self.playback_video,
+            video_dimensions=self.get_video_dimensions(), #selections are made in the source's coordinates, even when playing the proxy
             show_crop_overlay=True,
             bg_colour=bg_colour,
-            crop_aspect_ratio=crop_aspect_ratio
+            crop_aspect_ratio=crop_aspect_ratio,
+            keyframe_index=KeyframeIndex.load(fp) if proxy_fp == None else None, #instant if the file has been opened before. every frame of the proxy is a keyframe
+            proxy_strip=self.proxy_strip,
         )
 
+        #first time the file is opened, build the index without holding up the window. seeks use CAP_PROP_POS_FRAMES until it is ready
+        if proxy_fp == None and self.video_player.frame_reader.keyframe_index == None:
+            threading.Thread(target=self._build_keyframe_index,args=(fp,),daemon=True).start()
+
 
 
         self.play_bar = PlayBar(
             dimensions=self.gen_dimensions_playbar_surface(),
             position=self.gen_position_playbar_surface(),
             fps=self.v_fps,
-            frame_count=self.video.get(cv2.CAP_PROP_FRAME_COUNT),
+            frame_count=self.video_player.frame_count, #the capture is owned by the video player's reader thread from here on
             bg_colour=bg_colour,
         )
 
         self.in_fp = fp
         self.out_fp = out_file_path
 
+        #probe the codec now rather than finding out it is unsupported after the user has picked a crop
+        self.fourcc = resolve_fourcc(codec,out_file_path)
+
+        #number of input frames per exported frame
+        self.keep_every = keep_every_for_fps(self.v_fps,out_fps) if out_fps != None else 1
+
         #boolean variables
         self.quit_on_crop = quit_on_crop
         # self.shown = False
         self.running = False
 
+        #background export, None when no export is in progress
+        self.exporter : VideoExporter | None = None
+
 
 
     ### USER-EXPOSED INTERACTION METHODS ###
@@ -91,10 +147,21 @@ class VideoCropper:
         self.running = True
         self._start_event_loop()
 
+        self.video_player.close()
+        self.proxy_strip.stop()
+
+        if self.proxy_media != None:
+            self.proxy_media.stop()
+
     #quit
     def quit(self) -> None:
         self.running = False
 
+        #do not leave a half written file behind a daemon thread
+        if self.exporter != None and self.exporter.is_alive():
+            self.cancel_crop()
+            self.exporter.join()
+
     #resizes window and frame displayed
     def resize_window(self,xy:tuple[int,int]):
         min_size = (600,600)
@@ -137,54 +204,75 @@ class VideoCropper:
     def gen_position_playbar_surface(self) -> tuple[int,int]:
         return (0,self.gen_dimensions_video_surface()[1])
 
+    #run on a background thread, reads every packet of the file the first time it is opened
+    def _build_keyframe_index(self,fp:str) -> None:
+        keyframe_index = KeyframeIndex.load_or_build(fp)
+
+        #the player may have switched to the proxy in the meantime, which does not need it
+        if self.video_player.video is self.video:
+            self.video_player.set_keyframe_index(keyframe_index)
+
+    #play back the proxy from the frame currently shown, the source capture is no longer needed for playback
+    def _switch_to_proxy(self,proxy_fp:str) -> None:
+        proxy_video = cv2.VideoCapture(proxy_fp)
+
+        if proxy_video.isOpened() == False:
+            return
+
+        self.video_player.set_video(proxy_video)
+
+        self.playback_video.release()
+        self.playback_video = proxy_video
+        self.proxy_media = None
+
 
 
     ### VIDEO WRITE ###
 
-    # crop the video 
+    # crop the video (on a worker thread, progress is reported via EVENT_EXPORT_* events)
 
     def video_crop(self):
+        #only one export at a time
+        if self.is_exporting():
+            return
+
         selection = self.video_player.get_crop_selection()
 
         if selection == None:
             return
-        
-        x_range,y_range = selection
 
+        #only export the trimmed range
+        start_frame,end_frame = self.play_bar.get_trim()
+
+        self.exporter = VideoExporter(
+            in_fp=self.in_fp,
+            out_fp=self.out_fp,
+            selection=selection,
+            fourcc=self.fourcc,
+            keep_every=self.keep_every,
+            start_frame=start_frame,
+            end_frame=end_frame,
+        )
+        self.exporter.start()
 
-        #cropped frame size
-        frame_w = x_range[1] - x_range[0]
-        frame_h = y_range[1] - y_range[0]
-
-        #codec
-        fourcc = cv2.VideoWriter.fourcc(*"mp4v")
-        
-        #video writer constructor
-        out = cv2.VideoWriter(self.out_fp,fourcc,self.v_fps,(frame_w,frame_h)) 
-
-        #read from new videocapture
-        cap = cv2.VideoCapture(self.in_fp)
-
-        #read each frame of video
-        while cap.isOpened():
-            success,frame = cap.read()
+    #cancel export in progress
+    def cancel_crop(self):
+        if self.exporter != None:
+            self.exporter.cancel()
 
-            if success:
-                cropped_frame = frame[ y_range[0]:y_range[1], x_range[0]:x_range[1] ] #write colum first and width after? seems to work.
-                out.write(cropped_frame)
-            else:
-                cap.release()
-        
-        out.release()
-
-        if self.quit_on_crop:
-            self.quit()
+    #True until the worker has finished, including while a cancelled export is still stopping. a new export would write the same file
+    def is_exporting(self) -> bool:
+        return self.exporter != None and self.exporter.is_alive()
 
 
 
     ### EVENTS ###
 
     def _handle_event(self,event) -> None:
+        #posted by an exporter that has since been replaced (e.g cancelled, then a new export started before its last event arrived)
+        if event.type in (EVENT_EXPORT_PROGRESS,EVENT_EXPORT_COMPLETE,EVENT_EXPORT_CANCELLED,EVENT_EXPORT_FAILED) and event.exporter is not self.exporter:
+            return
+
         self.video_player._handle_event(event)
         self.play_bar._handle_event(event)
         
@@ -197,16 +285,40 @@ class VideoCropper:
             case pygame.VIDEORESIZE:
                 self.resize_window((event.w,event.h))
 
+            #window contents lost (e.g uncovered by another window), push everything again
+            case pygame.WINDOWEXPOSED:
+                self.video_player.mark_dirty()
+                self.play_bar.mark_dirty()
+
             #handle keypress
             case pygame.KEYDOWN:
                 self._handle_event_key_down(event)
+
+            #handle export finished
+            case _ if event.type == EVENT_EXPORT_COMPLETE:
+                self.exporter = None
+                if self.quit_on_crop:
+                    self.quit()
+
+            case _ if event.type == EVENT_EXPORT_CANCELLED:
+                self.exporter = None
+
+            #shown on the play bar
+            case _ if event.type == EVENT_EXPORT_FAILED:
+                self.exporter = None
+
+            case _ if event.type == EVENT_PROXY_READY:
+                self._switch_to_proxy(event.proxy_fp)
                 
     
     def _handle_event_key_down(self,event) -> None:
         match event.key:
-            #quit on escape key press (for dev testing purposes)
+            #cancel export on escape, otherwise quit (for dev testing purposes)
             case pygame.K_ESCAPE:
-                self.quit()
+                if self.is_exporting():
+                    self.cancel_crop()
+                else:
+                    self.quit()
 
             #save video
             case pygame.K_RETURN:
@@ -222,22 +334,28 @@ class VideoCropper:
         clock = pygame.time.Clock()
 
         while self.running:
-            clock.tick(self.v_fps)
+            #the player follows its own media clock, looping faster than the frame rate means frames are shown close to when they are due
+            clock.tick(self.v_fps * 2)
             
             #handle events
             for event in pygame.event.get():
                 self._handle_event(event)
 
 
-            isPlaying,isEndOfVideo = self.video_player.tick()
+            self.video_player.tick()
 
-            self.play_bar.tick(video_is_playing=isPlaying)
+            #the play bar follows the frame actually shown
+            self.play_bar.tick(frame_index=self.video_player.current_frame_index,dropped_frames=self.video_player.get_dropped_frames(),frame_count=self.video_player.frame_count)
 
-            
-            self.window.blit(self.video_player.surface,self.video_player.get_position())
-            self.window.blit(self.play_bar.surface,self.play_bar.get_position())
-            
-            pygame.display.flip()
+            #only blit and push the parts of the window that changed, e.g only the timestamp's changed characters or the crop overlay's changed area
+            dirty_rects = []
+
+            for component in (self.video_player,self.play_bar):
+                component.compose()
+                dirty_rects += component.blit_dirty(self.window)
+
+            if len(dirty_rects) > 0:
+                pygame.display.update(dirty_rects)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,93 @@
+import pygame
+import os
+import threading
+from export import export_crop,export_crop_pipelined,export_crop_segmented,export_crop_resumable,Selection,DEFAULT_CODEC
+
+from events import PostEvent_ExportProgress,PostEvent_ExportComplete,PostEvent_ExportFailed,PostEvent_ExportCancelled
+
+
+#runs the crop export on a worker thread so that the event loop (playback, ui) keeps running.
+#progress / completion is reported back to the event loop by posting events.
+class VideoExporter(threading.Thread):
+    def __init__(self,
+        in_fp:str,
+        out_fp:str,
+        selection:Selection,
+        fps:float | None = None,
+        fourcc:str = DEFAULT_CODEC, #fourcc or export.CODEC_PRESETS name
+        keep_every:int = 1, #only keep every nth frame, see export.keep_every_for_fps
+        start_frame:int = 0,
+        end_frame:int | None = None, #frame to stop before, None means the end of the video
+        pipelined:bool | None = None, #overlap decode / crop / encode, see export.export_crop_pipelined. None means only when more than one cpu is available
+        queue_size:int = 8,
+        crop_threads:int = 1,
+        segments:int | None = None, #if given, encode this many segments in parallel processes instead, see export.export_crop_segmented
+        resumable:bool = False, #checkpoint the export so a cancelled / crashed export can be resumed, see export.export_crop_resumable
+    ):
+        super().__init__(daemon=True)
+
+        self.in_fp = in_fp
+        self.out_fp = out_fp
+        self.selection = selection
+        self.fps = fps
+        self.fourcc = fourcc
+        self.keep_every = keep_every
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+
+        #the pipeline's stages can only overlap with more than one core, on a single core the extra threads just add overhead
+        self.pipelined = pipelined if pipelined != None else (os.cpu_count() or 1) > 1
+        self.queue_size = queue_size
+        self.crop_threads = crop_threads
+        self.segments = segments
+        self.resumable = resumable
+
+        self._cancel_event = threading.Event()
+
+
+    ### USER-EXPOSED ###
+
+    #request the export to stop, the worker finishes the frame it is on and then posts EVENT_EXPORT_CANCELLED
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+
+    ### WORKER ###
+
+    def run(self) -> None:
+        export_args = {
+            "in_fp": self.in_fp,
+            "out_fp": self.out_fp,
+            "selection": self.selection,
+            "fps": self.fps,
+            "fourcc": self.fourcc,
+            "keep_every": self.keep_every,
+            "start_frame": self.start_frame,
+            "end_frame": self.end_frame,
+            "on_progress": self._post_progress,
+            "cancel_event": self._cancel_event,
+        }
+
+        try:
+            if self.resumable:
+                completed = export_crop_resumable(**export_args)
+            elif self.segments != None:
+                completed = export_crop_segmented(**export_args,segments=self.segments)
+            elif self.pipelined:
+                completed = export_crop_pipelined(**export_args,queue_size=self.queue_size,crop_threads=self.crop_threads)
+            else:
+                completed = export_crop(**export_args)
+        except Exception as e:
+            pygame.event.post(PostEvent_ExportFailed(self,e).event())
+            return
+
+        if completed:
+            pygame.event.post(PostEvent_ExportComplete(self,self.out_fp).event())
+        else:
+            pygame.event.post(PostEvent_ExportCancelled(self).event())
+
+    def _post_progress(self,frames_done:int,frame_count:int,fps:float) -> None:
+        pygame.event.post(PostEvent_ExportProgress(self,frames_done,frame_count,fps).event())
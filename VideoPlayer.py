@@ -1,19 +1,38 @@
 import pygame
 import cv2 
+import time
+import numpy as np
 from Component import Component,Coordinate
 from CropOverlay import CropOverlay
+from FrameReader import FrameReader
+from FrameCache import FrameCache
+from KeyframeIndex import KeyframeIndex
+from ProxyStrip import ProxyStrip
+from SeekScheduler import SeekScheduler
 
 from events import EVENT_FRAME_SKIP,EVENT_PAUSE,EVENT_PLAY
 
+#while dragging along the play bar, the exact frame is decoded once the mouse has not moved for this long
+SCRUB_SETTLE_SECONDS = 0.08
+
+#slowest / fastest playback speed, as a multiple of the video's frame rate
+MIN_PLAYBACK_SPEED = 0.25
+MAX_PLAYBACK_SPEED = 8
 
 class VideoPlayer(Component):
     def __init__(self,
         dimensions:Coordinate, # the display dimensions we are working with
         position:Coordinate,
         video:cv2.VideoCapture,
+        video_dimensions:tuple[int,int] | None = None, #(width,height) of the source, if 'video' is a lower resolution proxy of it. crop selections are given in these dimensions
         crop_aspect_ratio: float | None = None,
         show_crop_overlay:bool = True,
         bg_colour = (0,0,0),
+        read_ahead:int = 8, #number of frames decoded ahead of the playhead on a background thread
+        frame_cache_bytes:int = 256 * 1024 * 1024, #memory budget for recently shown frames, so seeking back to them skips the decode
+        keyframe_index:KeyframeIndex | None = None, #seeks decode forward from the keyframe before the frame, and its packet count is used as the frame count. can also be set later with set_keyframe_index
+        proxy_strip:ProxyStrip | None = None, #low resolution frames shown while dragging along the play bar
+        reuse_display_buffer:bool = True, #resize frames into one array shared with the displayed surface, instead of allocating per frame
         parent:None | Component = None,
     ):
         #super
@@ -28,9 +47,31 @@ class VideoPlayer(Component):
         #READING FRAMES / DISPLAY
         self.video : cv2.VideoCapture = video
         self.current_frame_image = None #in future add logic which reads first frame, then reverts to frame index 0, to display still image on start
+        self.current_frame_index = -1 #index of current_frame_image, -1 until the first frame is shown
+        self.frame_changed = True #current_frame_image has changed since it was last resized onto the display
+
+        #array frames are resized into, and the surface sharing its memory. replaced only when the display size changes
+        self.reuse_display_buffer = reuse_display_buffer
+        self.display_buffer : np.ndarray | None = None
+        self.display_surface : pygame.Surface | None = None
+
+        #read once, the capture belongs to the frame reader thread from here on. CAP_PROP_FRAME_COUNT is an estimate, replaced by the keyframe index's count once there is one
+        self.frame_count = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT)) if keyframe_index == None else keyframe_index.frame_count
+        self.fps = self.video.get(cv2.CAP_PROP_FPS)
+
+        #MEDIA CLOCK
+        #playback follows the wall clock rather than the loop, frame 'clock_start_frame' was shown at 'clock_start_time'. started for real by the first frame shown
+        self.clock_start_time = time.perf_counter()
+        self.clock_start_frame = self.current_frame_index
+        self.playback_speed = 1.0
+        self.reverse = False
+
+        if video_dimensions != None:
+            v_width,v_height = video_dimensions
+        else:
+            v_height = self.video.get(cv2.CAP_PROP_FRAME_HEIGHT)
+            v_width = self.video.get(cv2.CAP_PROP_FRAME_WIDTH)
 
-        v_height = self.video.get(cv2.CAP_PROP_FRAME_HEIGHT)
-        v_width = self.video.get(cv2.CAP_PROP_FRAME_WIDTH)
         self.aspect_ratio = v_width / v_height
 
         frame_dimensions = self._gen_frame_dimensions_maintaining_aspect_ratio_to_fit_surface()
@@ -59,28 +100,86 @@ class VideoPlayer(Component):
         #BOOLEAN
         self.show_crop_overlay = show_crop_overlay
         self.paused = False
+
+        #decoding happens on the frame reader thread, tick only takes already decoded frames from its buffer
+        self.read_ahead = read_ahead
+        self.dropped_frames_previous_readers = 0 #dropped by frame readers replaced in set_video
+        self.frame_reader = FrameReader(self.video,buffer_size=read_ahead,keyframe_index=keyframe_index)
+        self.frame_reader.start()
+
+        self.frame_cache = FrameCache(max_bytes=frame_cache_bytes)
+
+        #SCRUBBING
+        self.proxy_strip = proxy_strip
+        self.scrub_frame_index : int | None = None #exact frame to show once the drag settles, None when not showing a proxy
+        self.scrub_last_move = 0 #time.perf_counter() of the last preview frame skip
+
+        #frame skips are served on the next tick, only the newest one
+        self.seek_scheduler = SeekScheduler()
     
 
 
     ### DRAW ###
 
     def draw(self) -> None:
+        if self.show_crop_overlay:
+            self.component_crop_overlay.compose()
+
+        changed_rect = None #None if the whole surface is redrawn
+
+        #only the crop overlay changed, the rest of the surface is still correct so only the area it changed in is redrawn (and pushed to the display)
+        if not self.frame_changed and self.show_crop_overlay and self.component_crop_overlay.dirty:
+            frame_left,frame_top = self.frame.get_position()
+            overlay_left,overlay_top = self.component_crop_overlay.get_position()
+
+            changed_rect = self.component_crop_overlay.get_changed_rect().move(frame_left + overlay_left,frame_top + overlay_top)
+            self.surface.set_clip(changed_rect)
+
         self.surface.fill(self.bg_colour)
 
-        #resize frame to fit display
-        resized_frame = cv2.resize(self.current_frame_image,self.frame.get_dimensions())
+        #resize frame to fit display, only when there is a new frame (or the display has been resized).
+        #the frame component keeps the resized frame without the overlay, so an overlay change is only two blits
+        if self.frame_changed and self.current_frame_image is not None:
+            if self.reuse_display_buffer:
+                self._resize_into_display_buffer()
+            else:
+                resized_frame = cv2.resize(self.current_frame_image,self.frame.get_dimensions())
 
-        frame_image_surface = pygame.image.frombuffer(resized_frame.tobytes(),resized_frame.shape[1::-1],"BGR")
+                frame_image_surface = pygame.image.frombuffer(resized_frame.tobytes(),resized_frame.shape[1::-1],"BGR")
 
-        self.frame.set_surface(frame_image_surface)
+                self.frame.set_surface(frame_image_surface)
 
-        if self.show_crop_overlay:
-            self.frame.surface.blit(self.component_crop_overlay.surface,self.component_crop_overlay.get_position())
+            self.frame_changed = False
 
         self.surface.blit(self.frame.surface,self.frame.get_position())
 
+        if self.show_crop_overlay:
+            frame_left,frame_top = self.frame.get_position()
+            overlay_left,overlay_top = self.component_crop_overlay.get_position()
+
+            self.component_crop_overlay.blit_onto(self.surface,(frame_left + overlay_left,frame_top + overlay_top))
+
+        self.surface.set_clip(None)
+        self.mark_dirty(changed_rect)
+
 
     
+    #resize the current frame straight into the array backing the frame component's surface.
+    #no new array, bytes or surface per frame, the surface sees the new pixels as soon as they are written
+    def _resize_into_display_buffer(self) -> None:
+        width,height = self.frame.get_dimensions()
+
+        #display resized (the frame component then has a new blank surface)
+        if self.display_surface == None or self.frame.surface is not self.display_surface:
+            self.display_buffer = np.empty((height,width,3),dtype=np.uint8)
+            self.display_surface = pygame.image.frombuffer(self.display_buffer,(width,height),"BGR")
+
+            self.frame.set_surface(self.display_surface)
+
+        cv2.resize(self.current_frame_image,(width,height),dst=self.display_buffer)
+        self.frame.mark_dirty()
+
+
     ### EVENTS ###
     
     #handle resize
@@ -97,7 +196,8 @@ class VideoPlayer(Component):
         self.component_crop_overlay.resize(self.frame.get_dimensions())
 
         #redisplay current frame onto new surface
-        self.draw()
+        self.frame_changed = True
+        self.invalidate()
 
     def _handle_event(self,event):
         #pass of events to children
@@ -108,7 +208,7 @@ class VideoPlayer(Component):
         if event.type == pygame.KEYDOWN:
             self._handle_event_key_down(event)
         elif event.type == EVENT_FRAME_SKIP:
-            self.jump_to_frame(frame_indx=event.frame_index)
+            self.seek_scheduler.request(event.frame_index,preview=event.preview,requested_at=event.requested_at)
         elif event.type == EVENT_PAUSE:
             self.pause()
         elif event.type == EVENT_PLAY:
@@ -122,18 +222,72 @@ class VideoPlayer(Component):
             else:
                 pygame.event.post(pygame.event.Event(EVENT_PAUSE))
 
+        #J / K / L shuttle: play backwards / pause / play forwards, pressing J or L again while already playing that way doubles the speed
+        elif event.key in (pygame.K_j,pygame.K_l):
+            reverse = event.key == pygame.K_j
+
+            if not self.paused and self.reverse == reverse:
+                self.set_playback_speed(min(MAX_PLAYBACK_SPEED,self.playback_speed * 2))
+            else:
+                self.set_reverse(reverse)
+                self.set_playback_speed(1.0)
+
+                if self.paused:
+                    pygame.event.post(pygame.event.Event(EVENT_PLAY))
+
+        elif event.key == pygame.K_k:
+            if not self.paused:
+                pygame.event.post(pygame.event.Event(EVENT_PAUSE))
+
+        #slower / faster, without changing direction
+        elif event.key == pygame.K_MINUS:
+            self.set_playback_speed(max(MIN_PLAYBACK_SPEED,self.playback_speed / 2))
+        elif event.key == pygame.K_EQUALS:
+            self.set_playback_speed(min(MAX_PLAYBACK_SPEED,self.playback_speed * 2))
+
 
 
 
 
     ### SETTERS ###
 
+    def set_keyframe_index(self,keyframe_index:KeyframeIndex | None) -> None:
+        self.frame_reader.set_keyframe_index(keyframe_index)
+
+        #every packet has been counted, more reliable than the container's estimate
+        if keyframe_index != None:
+            self.frame_count = max(keyframe_index.frame_count,self.current_frame_index + 1)
+
+    #switch to another capture of the same video (e.g a lower resolution proxy), showing the same frame.
+    #the previous capture is no longer used and can be released by the caller
+    def set_video(self,video:cv2.VideoCapture,keyframe_index:KeyframeIndex | None = None) -> None:
+        self.frame_reader.stop()
+        self.dropped_frames_previous_readers += self.frame_reader.dropped_frames
+
+        self.video = video
+        self.frame_reader = FrameReader(self.video,buffer_size=self.read_ahead,keyframe_index=keyframe_index)
+        self.frame_reader.set_reverse(self.reverse,max(0,self.current_frame_index))
+        self.frame_reader.set_frame_step(self._get_frame_step(),self.current_frame_index)
+        self.frame_reader.start()
+
+        #cached frames are from the previous capture, the memory is better spent on the new one
+        self.frame_cache.clear()
+
+        if self.current_frame_index >= 0:
+            self.jump_to_frame(self.current_frame_index)
+
     #set current frame
-    def set_current_frame(self,frame) -> None:
+    def set_current_frame(self,frame,frame_index:int) -> None:
+        #CAP_PROP_FRAME_COUNT is only an estimate, the video is at least as long as the frames actually read from it
+        if frame_index >= self.frame_count:
+            self.frame_count = frame_index + 1
+
         self.current_frame_image = frame
+        self.current_frame_index = frame_index
+        self.frame_changed = True
+        self.invalidate()
 
-        # #update display
-        # self.draw()
+        self.frame_cache.put(frame_index,frame)
 
     
 
@@ -195,15 +349,60 @@ class VideoPlayer(Component):
     
     #toggle pause
     def toggle_pause(self) -> bool:
-        self.paused = not self.paused
+        if self.paused:
+            self.play()
+        else:
+            self.pause()
+
         return self.paused
     
     def pause(self):
         self.paused = True
 
+    #multiple of the video's frame rate, between MIN_PLAYBACK_SPEED and MAX_PLAYBACK_SPEED
+    def set_playback_speed(self,playback_speed:float) -> None:
+        if playback_speed < MIN_PLAYBACK_SPEED or playback_speed > MAX_PLAYBACK_SPEED:
+            raise ValueError(f"invalid playback speed '{playback_speed}', must be between {MIN_PLAYBACK_SPEED} and {MAX_PLAYBACK_SPEED}")
+
+        frame_step = self._get_frame_step()
+        self.playback_speed = playback_speed
+
+        if self._get_frame_step() != frame_step:
+            self.frame_reader.set_frame_step(self._get_frame_step(),self.current_frame_index)
+
+            #the frames read ahead were chosen for the old step, read again from the frame after the one shown
+            next_frame_index = self.current_frame_index - 1 if self.reverse else self.current_frame_index + 1
+            self.frame_reader.seek(max(0,next_frame_index))
+
+        self._reset_media_clock(self.current_frame_index)
+
+    #faster than 1x, the frames in between those shown are not worth decoding (at 4x only every 4th frame can be shown)
+    def _get_frame_step(self) -> int:
+        return max(1,int(self.playback_speed))
+
+    #play backwards. the reader decodes a chunk of frames forwards at a time and hands them out last frame first, rather than seeking for every frame
+    def set_reverse(self,reverse:bool) -> None:
+        if reverse == self.reverse:
+            return
+
+        self.reverse = reverse
+
+        #the frame after the one shown, in the new direction
+        next_frame_index = self.current_frame_index - 1 if reverse else self.current_frame_index + 1
+        self.frame_reader.set_reverse(reverse,max(0,next_frame_index))
+
+        self._reset_media_clock(self.current_frame_index)
+
     def play(self):
         self.paused = False
 
+        #carry on from the frame shown, not from where the clock would be had it kept running while paused
+        self._reset_media_clock(self.current_frame_index)
+
+    #stop the frame reader thread, to be called once the player is no longer used
+    def close(self):
+        self.frame_reader.stop()
+
 
 
     # to be called on each tick of the loop
@@ -211,34 +410,135 @@ class VideoPlayer(Component):
         """returns booleans ( isPlaying , isEndOfVideo )"""
         isEndOfVideo = False
         isPlaying = not self.paused
-        
-        if not self.paused:
-            success,frame = self.video.read()
-            
-            if not success:
-                self.jump_to_frame(0)
+
+        seek = self.seek_scheduler.take()
+
+        if seek != None:
+            frame_index,preview = seek
+
+            if preview:
+                self.preview_frame(frame_index)
+            else:
+                self.jump_to_frame(frame_index)
+
+            #a preview may have been served exactly (see preview_frame)
+            if self.scrub_frame_index == None:
+                self.seek_scheduler.record_shown()
+
+            #the play bar has already moved to the frame skipped to
+            isPlaying = False
+
+        elif self.scrub_frame_index != None:
+            #showing a proxy, playback waits for the exact frame
+            isPlaying = False
+
+            if time.perf_counter() - self.scrub_last_move >= SCRUB_SETTLE_SECONDS:
+                self.jump_to_frame(self.scrub_frame_index)
+                self.seek_scheduler.record_shown()
+
+        elif not self.paused and self.current_frame_index == -1:
+            #nothing shown yet. the clock starts with the first frame, otherwise the time spent setting up (opening the window,
+            #building the play bar) counts as playback that fell behind, and the first frames are dropped
+            next_frame = self.frame_reader.pop()
+
+            if next_frame != None:
+                frame_index,frame = next_frame
+                self.set_current_frame(frame,frame_index)
+                self._reset_media_clock(frame_index)
+            else:
+                isPlaying = False
+
+        elif not self.paused:
+            clock_frame = self._get_media_clock_frame()
+
+            #if playback is behind, the frames the clock has passed are grabbed without being retrieved by the reader,
+            #or dropped if they were already decoded, rather than shown late.
+            #above 1x the frames in between those on the step's cadence are never decoded, the reader does not count them as dropped
+            self.frame_reader.set_due_frame(clock_frame)
+            next_frame = self.frame_reader.pop_due(clock_frame)
+
+            if next_frame != None:
+                frame_index,frame = next_frame
+                self.set_current_frame(frame,frame_index)
+            elif self.frame_reader.is_end_of_video():
+                #loop round, to the last frame when playing backwards
+                self.jump_to_frame(self.frame_count - 1 if self.reverse else 0)
                 isEndOfVideo =  True
             else:
-                self.set_current_frame(frame)
+                #the next frame is not due yet, or the reader has fallen behind. keep showing the current frame rather than blocking the loop
+                isPlaying = False
+
+        #mouse movement since the last tick is applied to the overlay once, however many motion events there were
+        if self.show_crop_overlay:
+            self.component_crop_overlay.tick()
 
-        #update display on every tick (possible inefficiency)
-        self.draw()
+        #only redraw when there is something new to show, a paused video with an untouched overlay costs nothing
+        self.compose()
 
         return (isPlaying,isEndOfVideo)
     
 
+    #frames dropped to keep up with the media clock since the video was opened
+    def get_dropped_frames(self) -> int:
+        return self.dropped_frames_previous_readers + self.frame_reader.dropped_frames
+
+    #index of the frame that should be on screen now
+    def _get_media_clock_frame(self) -> int:
+        frames_elapsed = int((time.perf_counter() - self.clock_start_time) * self.fps * self.playback_speed)
+
+        return self.clock_start_frame - frames_elapsed if self.reverse else self.clock_start_frame + frames_elapsed
+
+    def _reset_media_clock(self,frame_index:int) -> None:
+        self.clock_start_time = time.perf_counter()
+        self.clock_start_frame = frame_index
+
+    #show the closest proxy straight away, the exact frame is decoded once the drag settles (see tick)
+    def preview_frame(self,frame_index:int) -> None:
+        proxy = self.proxy_strip.nearest(frame_index) if self.proxy_strip != None else None
+
+        #nothing to preview with, or the exact frame is just as cheap
+        if proxy == None or frame_index in self.frame_cache:
+            self.jump_to_frame(frame_index)
+            return
+
+        _,proxy_frame = proxy
+
+        #not set_current_frame, the proxy must not end up in the frame cache
+        self.current_frame_image = proxy_frame
+        self.current_frame_index = frame_index
+        self.frame_changed = True
+        self.invalidate()
+
+        self.scrub_frame_index = frame_index
+        self.scrub_last_move = time.perf_counter()
+
     #return true if successfully jumped, return false if out of range of frames
     def jump_to_frame(self,frame_indx:int) -> bool:
-        max_frame = self.video.get(cv2.CAP_PROP_FRAME_COUNT)
+        self.scrub_frame_index = None
+
+        max_frame = self.frame_count
 
         #invalid frame
         if frame_indx > max_frame or frame_indx < 0:
             return False
         
-        self.video.set(cv2.CAP_PROP_POS_FRAMES,frame_indx)
-        success,frame = self.video.read()
+        cached_frame = self.frame_cache.get(frame_indx)
+
+        if cached_frame is not None:
+            #no need to wait on a decode, the reader only has to start reading ahead from the frame after this one
+            self.frame_reader.seek(frame_indx - 1 if self.reverse else frame_indx + 1)
+            self.set_current_frame(cached_frame,frame_indx)
+            self._reset_media_clock(frame_indx)
+            return True
 
-        if not success:
+        #flushes the read ahead buffer, the reader then carries on decoding from the frame after this one
+        next_frame = self.frame_reader.seek_and_wait(frame_indx)
+
+        if next_frame == None:
             raise Exception("unexpected error, unable to read frame when jumping to frame.")
 
-        self.set_current_frame(frame)
\ No newline at end of file
+        frame_index,frame = next_frame
+        self.set_current_frame(frame,frame_index)
+        self._reset_media_clock(frame_index)
+
+        return True
\ No newline at end of file
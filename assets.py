@@ -0,0 +1,78 @@
+import pygame
+import collections
+
+#images and fonts are loaded from disk once and shared, rather than once per component that uses them.
+#scaled copies of images are kept too (least recently used are evicted), so a component redrawn at the same size
+#blits the same scaled surface instead of scaling again. shared surfaces must not be drawn on.
+
+
+#most scaled images kept, a window resize creates a new size of every image
+MAX_SCALED_IMAGES = 64
+
+
+_images : dict[str,pygame.Surface] = {}
+_converted_images : set[str] = set() #images converted to the display's pixel format
+_fonts : dict[tuple[str,int],pygame.font.Font] = {}
+_scaled_images : collections.OrderedDict[tuple[pygame.Surface,tuple[int,int]],pygame.Surface] = collections.OrderedDict() #least recently used first
+
+
+### LOADING ###
+
+#image at 'fp', converted to the display's pixel format (which blits faster) once there is a display
+def load_image(fp:str) -> pygame.Surface:
+    image = _images.get(fp)
+
+    if image == None:
+        image = pygame.image.load(fp)
+        _images[fp] = image
+
+    #loaded before the display was created (e.g the window icon), convert it now
+    if fp not in _converted_images and pygame.display.get_surface() != None:
+        image = image.convert_alpha()
+        _images[fp] = image
+        _converted_images.add(fp)
+
+    return image
+
+def load_font(fp:str,size:int) -> pygame.font.Font:
+    font = _fonts.get((fp,size))
+
+    if font == None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+
+        font = pygame.font.Font(fp,size)
+        _fonts[(fp,size)] = font
+
+    return font
+
+
+### SCALING ###
+
+#'image' scaled to 'dimensions', the same surface is returned for the same image and dimensions
+def scale_image(image:pygame.Surface,dimensions:tuple[int,int]) -> pygame.Surface:
+    dimensions = (int(dimensions[0]),int(dimensions[1]))
+
+    if dimensions == image.get_size():
+        return image
+
+    key = (image,dimensions)
+    scaled_image = _scaled_images.get(key)
+
+    if scaled_image != None:
+        _scaled_images.move_to_end(key)
+        return scaled_image
+
+    scaled_image = pygame.transform.scale(image,dimensions)
+    _scaled_images[key] = scaled_image
+
+    while len(_scaled_images) > MAX_SCALED_IMAGES:
+        _scaled_images.popitem(last=False)
+
+    return scaled_image
+
+def clear() -> None:
+    _images.clear()
+    _converted_images.clear()
+    _fonts.clear()
+    _scaled_images.clear()
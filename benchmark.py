@@ -0,0 +1,497 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+
+#ui parts are benchmarked without a real window
+os.environ.setdefault("SDL_VIDEODRIVER","dummy")
+os.environ.setdefault("SDL_AUDIODRIVER","dummy")
+
+#pygame prints a banner to stdout on import, which would corrupt the json written to stdout
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT","1")
+
+import cv2
+import numpy as np
+import pygame
+
+from export import EXPORT_MODES,CODEC_PRESETS,export_crop,resolve_fourcc,segment_join_method,measure_segmented_speedup,measure_export_allocations
+from events import PostEvent_FrameSkip
+
+
+#(name , width , height) of the synthetic clips
+RESOLUTIONS = [
+    ("480p",854,480),
+    ("720p",1280,720),
+    ("1080p",1920,1080),
+]
+
+#frame counts of the synthetic clips
+LENGTHS = [60,240]
+
+CLIP_FPS = 30
+
+#window the ui parts are rendered into
+WINDOW_DIMENSIONS = (1200,800)
+
+
+
+### SYNTHETIC CLIPS ###
+
+#write a deterministic clip (same pixels on every run) to 'fp': a gradient, a moving box, noise and the frame number.
+#the noise keeps the encoder from having an unrealistically easy time
+def generate_clip(fp:str,width:int,height:int,frame_count:int,fps:float = CLIP_FPS) -> None:
+    out = cv2.VideoWriter(fp,cv2.VideoWriter.fourcc(*"mp4v"),fps,(width,height))
+
+    if not out.isOpened():
+        raise Exception(f"could not open video writer for '{fp}'.")
+
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0,32,(height,width,3),dtype=np.uint8)
+
+    gradient = np.zeros((height,width,3),dtype=np.uint8)
+    gradient[:,:,0] = np.linspace(0,255,width,dtype=np.uint8)[np.newaxis,:]
+    gradient[:,:,1] = np.linspace(0,255,height,dtype=np.uint8)[:,np.newaxis]
+
+    box_w = width // 8
+    box_h = height // 8
+
+    for i in range(frame_count):
+        frame = gradient.copy()
+        frame[:,:,2] = (i * 4) % 256
+        frame += np.roll(noise,i * 7,axis=1)
+
+        box_left = (i * 13) % (width - box_w)
+        box_top = (i * 7) % (height - box_h)
+        frame[box_top:box_top + box_h,box_left:box_left + box_w] = 255
+
+        cv2.putText(frame,str(i),(width // 20,height // 2),cv2.FONT_HERSHEY_SIMPLEX,height / 200,(0,0,0),max(1,height // 100))
+
+        out.write(frame)
+
+    out.release()
+
+#generate every clip in 'clip_dir' (skipping clips that already exist), returns a list of clip descriptions
+def generate_clips(clip_dir:str,resolutions:list = RESOLUTIONS,lengths:list[int] = LENGTHS) -> list[dict]:
+    clips = []
+
+    for name,width,height in resolutions:
+        for frame_count in lengths:
+            fp = os.path.join(clip_dir,f"synthetic_{name}_{frame_count}.mp4")
+
+            if not os.path.exists(fp):
+                generate_clip(fp,width,height,frame_count)
+
+            clips.append({
+                "name": f"{name}_{frame_count}",
+                "path": fp,
+                "width": width,
+                "height": height,
+                "frame_count": frame_count,
+                "fps": CLIP_FPS,
+            })
+
+    return clips
+
+
+
+### MEASUREMENTS ###
+
+#time each export mode on the clip, cropping the centre half of the frame
+def bench_export(clip:dict,modes:list[str]) -> dict:
+    width = clip["width"]
+    height = clip["height"]
+    selection = ((width // 4,width // 4 + width // 2),(height // 4,height // 4 + height // 2))
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for mode in modes:
+            out_fp = os.path.join(temp_dir,f"{mode}.mp4")
+
+            start_time = time.perf_counter()
+            EXPORT_MODES[mode](clip["path"],out_fp,selection)
+            seconds = time.perf_counter() - start_time
+
+            results[mode] = {
+                "seconds": seconds,
+                "fps": clip["frame_count"] / seconds,
+            }
+
+    return results
+
+#time the segmented export against the serial one (see export.measure_segmented_speedup), a segmented export that
+#writes a different number of frames is reported on stderr as well as in the results
+def bench_segmented(clip:dict) -> dict:
+    width = clip["width"]
+    height = clip["height"]
+    selection = ((width // 4,width // 4 + width // 2),(height // 4,height // 4 + height // 2))
+
+    results = measure_segmented_speedup(clip["path"],selection)
+
+    if not results["frame_counts_match"]:
+        print(f"segmented export of {clip['name']} wrote {results['segmented_frame_count']} frames, the serial export wrote {results['serial_frame_count']}",file=sys.stderr)
+
+    return results
+
+#frame sized allocations made by the serial export with and without buffer reuse (see export.measure_export_allocations)
+def bench_export_allocations(clip:dict) -> dict:
+    width = clip["width"]
+    height = clip["height"]
+    selection = ((width // 4,width // 4 + width // 2),(height // 4,height // 4 + height // 2))
+
+    return measure_export_allocations(clip["path"],selection)
+
+#time the serial export with each codec preset, and record the size of the file it writes
+def bench_codecs(clip:dict) -> dict:
+    width = clip["width"]
+    height = clip["height"]
+    selection = ((width // 4,width // 4 + width // 2),(height // 4,height // 4 + height // 2))
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for preset in CODEC_PRESETS:
+            out_fp = os.path.join(temp_dir,f"{preset}.mp4")
+
+            start_time = time.perf_counter()
+            export_crop(clip["path"],out_fp,selection,fourcc=preset)
+            seconds = time.perf_counter() - start_time
+
+            results[preset] = {
+                "fourcc": resolve_fourcc(preset,out_fp),
+                "seconds": seconds,
+                "fps": clip["frame_count"] / seconds,
+                "bytes": os.path.getsize(out_fp),
+            }
+
+    return results
+
+#time VideoPlayer.jump_to_frame to random frames
+def bench_seek(clip:dict,samples:int) -> dict:
+    video,video_player = _open_video_player(clip["path"])
+
+    rng = random.Random(0)
+    timings = []
+
+    for _ in range(samples):
+        frame_indx = rng.randrange(0,clip["frame_count"])
+
+        start_time = time.perf_counter()
+        video_player.jump_to_frame(frame_indx)
+        timings.append(time.perf_counter() - start_time)
+
+    video_player.close()
+    video.release()
+
+    return _summarise_timings(timings)
+
+#time VideoPlayer.jump_to_frame while scrubbing back and forth over the same frames, as dragging the play bar does.
+#after the first pass the frames should come from the frame cache
+def bench_scrub(clip:dict,samples:int,window:int = 30) -> dict:
+    video,video_player = _open_video_player(clip["path"])
+
+    window = min(window,clip["frame_count"])
+    sweep = list(range(window)) + list(range(window - 1,-1,-1))
+
+    timings = []
+
+    for i in range(samples):
+        start_time = time.perf_counter()
+        video_player.jump_to_frame(sweep[i % len(sweep)])
+        timings.append(time.perf_counter() - start_time)
+
+    results = _summarise_timings(timings)
+    results["cache_hits"] = video_player.frame_cache.hits
+    results["cache_misses"] = video_player.frame_cache.misses
+
+    video_player.close()
+    video.release()
+
+    return results
+
+#time VideoPlayer.preview_frame to random frames (what dragging along the play bar does), once the proxy strip is built
+def bench_preview(clip:dict,samples:int) -> dict:
+    from ProxyStrip import ProxyStrip
+
+    proxy_strip = ProxyStrip(clip["path"])
+
+    start_time = time.perf_counter()
+    proxy_strip.start()
+    proxy_strip.join()
+    build_seconds = time.perf_counter() - start_time
+
+    video,video_player = _open_video_player(clip["path"],proxy_strip=proxy_strip)
+
+    rng = random.Random(0)
+    timings = []
+
+    for _ in range(samples):
+        frame_indx = rng.randrange(0,clip["frame_count"])
+
+        start_time = time.perf_counter()
+        video_player.preview_frame(frame_indx)
+        timings.append(time.perf_counter() - start_time)
+
+    results = _summarise_timings(timings)
+    results["proxy_build_seconds"] = build_seconds
+
+    video_player.close()
+    video.release()
+
+    return results
+
+#simulate dragging along the play bar: several frame skips arrive per tick (the mouse moves faster than the frame rate),
+#then the mouse stops. measures the latency from the last frame skip to the exact frame being shown, and how many skips were coalesced
+def bench_drag(clip:dict,drags:int,ticks_per_drag:int = 10,skips_per_tick:int = 4) -> dict:
+    from ProxyStrip import ProxyStrip
+
+    proxy_strip = ProxyStrip(clip["path"])
+    proxy_strip.start()
+    proxy_strip.join()
+
+    video,video_player = _open_video_player(clip["path"],proxy_strip=proxy_strip)
+
+    rng = random.Random(0)
+
+    for _ in range(drags):
+        frame_indx = rng.randrange(0,clip["frame_count"])
+
+        for _ in range(ticks_per_drag):
+            for _ in range(skips_per_tick):
+                frame_indx = min(clip["frame_count"] - 1,frame_indx + rng.randrange(1,8))
+                video_player._handle_event(PostEvent_FrameSkip(frame_indx,preview=True).event())
+
+            video_player.tick()
+
+        #mouse stopped, tick until the exact frame is shown
+        while video_player.scrub_frame_index != None or video_player.seek_scheduler.has_pending():
+            video_player.tick()
+
+    scheduler = video_player.seek_scheduler
+
+    results = scheduler.get_latency_stats()
+    results["requested"] = scheduler.requested
+    results["coalesced"] = scheduler.coalesced
+
+    video_player.close()
+    video.release()
+
+    return results
+
+#time VideoPlayer.draw of a new frame, with and without the reused display buffer, and measure what each draw allocates.
+#tracemalloc only sees the python heap (numpy arrays, bytes), not pixel memory allocated by pygame / SDL, so the pixel
+#memory of every surface a draw replaces the frame's surface with is counted separately (pitch * height per surface)
+def bench_upload(clip:dict,samples:int) -> dict:
+    results = {}
+
+    for reuse_display_buffer in (False,True):
+        video,video_player = _open_video_player(clip["path"],reuse_display_buffer=reuse_display_buffer)
+
+        #first draw allocates the display buffer, which is not per frame
+        video_player.draw()
+
+        timings = []
+        traced_bytes = 0
+        new_surfaces = 0
+        new_surface_bytes = 0
+
+        tracemalloc.start()
+
+        for _ in range(samples):
+            video_player.frame_changed = True
+            frame_surface = video_player.frame.surface
+
+            current_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+            start_time = time.perf_counter()
+            video_player.draw()
+            timings.append(time.perf_counter() - start_time)
+
+            traced_bytes += tracemalloc.get_traced_memory()[1] - current_bytes
+
+            if video_player.frame.surface is not frame_surface:
+                new_surfaces += 1
+                new_surface_bytes += video_player.frame.surface.get_pitch() * video_player.frame.surface.get_height()
+
+        tracemalloc.stop()
+
+        results["reuse_display_buffer" if reuse_display_buffer else "allocating"] = {
+            **_summarise_timings(timings),
+            "traced_bytes_per_frame": traced_bytes / samples, #python heap only
+            "new_surfaces_per_frame": new_surfaces / samples,
+            "new_surface_bytes_per_frame": new_surface_bytes / samples, #pixel memory of those surfaces, whoever allocated it
+        }
+
+        video_player.close()
+        video.release()
+
+    return results
+
+#time VideoPlayer.tick, both while playing (a new frame to draw on every tick, decoding happens on the reader thread and is not timed) and while paused
+def bench_tick(clip:dict,samples:int) -> dict:
+    video,video_player = _open_video_player(clip["path"])
+
+    results = {}
+
+    for paused in (False,True):
+        if paused:
+            video_player.pause()
+        else:
+            video_player.play()
+
+        timings = []
+        for _ in range(samples):
+            #wait for the reader, otherwise the tick has nothing to draw
+            while not paused and video_player.frame_reader.available() == 0 and not video_player.frame_reader.is_end_of_video():
+                time.sleep(0.001)
+
+            #the next frame is due now, rather than waiting a frame period on the media clock
+            video_player._reset_media_clock(video_player.current_frame_index + 1)
+
+            start_time = time.perf_counter()
+            video_player.tick()
+            timings.append(time.perf_counter() - start_time)
+
+        results["paused" if paused else "playing"] = _summarise_timings(timings)
+
+    video_player.close()
+    video.release()
+
+    return results
+
+
+
+### UTILITY ###
+
+def _open_video_player(fp:str,proxy_strip = None,reuse_display_buffer:bool = True):
+    #imported here so that the export benchmarks do not depend on the ui modules
+    from VideoPlayer import VideoPlayer
+    from KeyframeIndex import KeyframeIndex
+
+    video = cv2.VideoCapture(fp)
+
+    video_player = VideoPlayer(
+        dimensions=(WINDOW_DIMENSIONS[0],WINDOW_DIMENSIONS[1] - 200),
+        position=(0,0),
+        video=video,
+        show_crop_overlay=True,
+        keyframe_index=KeyframeIndex.load_or_build(fp), #as VideoCropper has once the index is built
+        proxy_strip=proxy_strip,
+        reuse_display_buffer=reuse_display_buffer,
+    )
+
+    #first frame, so there is always something to draw
+    video_player.jump_to_frame(0)
+
+    return video,video_player
+
+#timings given in seconds, summary given in milliseconds
+def _summarise_timings(timings:list[float]) -> dict:
+    timings_ms = sorted(t * 1000 for t in timings)
+
+    return {
+        "samples": len(timings_ms),
+        "mean_ms": statistics.fmean(timings_ms),
+        "median_ms": statistics.median(timings_ms),
+        "p95_ms": timings_ms[min(len(timings_ms) - 1,int(len(timings_ms) * 0.95))],
+        "max_ms": timings_ms[-1],
+    }
+
+def _get_environment() -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "segment_join": segment_join_method(), #the segmented / resumable export times depend on it
+    }
+
+
+
+### RUN ###
+
+def run(clip_dir:str,modes:list[str],resolutions:list = RESOLUTIONS,lengths:list[int] = LENGTHS,seek_samples:int = 50,tick_samples:int = 100) -> dict:
+    pygame.init()
+    pygame.display.set_mode(WINDOW_DIMENSIONS)
+
+    results = {
+        "environment": _get_environment(),
+        "clips": [],
+    }
+
+    for clip in generate_clips(clip_dir,resolutions,lengths):
+        print(f"benchmarking {clip['name']}",file=sys.stderr)
+
+        results["clips"].append({
+            "name": clip["name"],
+            "width": clip["width"],
+            "height": clip["height"],
+            "frame_count": clip["frame_count"],
+            "fps": clip["fps"],
+            "export": bench_export(clip,modes),
+            "segmented": bench_segmented(clip) if "segmented" in modes else None,
+            "export_allocations": bench_export_allocations(clip),
+            "codecs": bench_codecs(clip),
+            "seek": bench_seek(clip,seek_samples),
+            "scrub": bench_scrub(clip,seek_samples),
+            "preview": bench_preview(clip,seek_samples),
+            "drag": bench_drag(clip,max(1,seek_samples // 10)),
+            "tick": bench_tick(clip,tick_samples),
+            "upload": bench_upload(clip,tick_samples),
+        })
+
+    pygame.quit()
+
+    return results
+
+
+def main(argv:list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="benchmark export speed, seek latency and per-tick render time on synthetic clips.")
+    parser.add_argument("--out",default=None,help="write results json to this file (default: stdout)")
+    parser.add_argument("--clip-dir",default=None,help="keep generated clips in this directory and reuse them on later runs (default: temporary directory)")
+    parser.add_argument("--modes",nargs="+",choices=list(EXPORT_MODES),default=list(EXPORT_MODES),help="export modes to benchmark")
+    parser.add_argument("--quick",action="store_true",help="only the smallest resolution and length")
+    parser.add_argument("--seek-samples",type=int,default=50)
+    parser.add_argument("--tick-samples",type=int,default=100)
+
+    args = parser.parse_args(argv)
+
+    resolutions = RESOLUTIONS[:1] if args.quick else RESOLUTIONS
+    lengths = LENGTHS[:1] if args.quick else LENGTHS
+
+    run_args = {
+        "modes": args.modes,
+        "resolutions": resolutions,
+        "lengths": lengths,
+        "seek_samples": args.seek_samples,
+        "tick_samples": args.tick_samples,
+    }
+
+    if args.clip_dir != None:
+        os.makedirs(args.clip_dir,exist_ok=True)
+        results = run(args.clip_dir,**run_args)
+    else:
+        with tempfile.TemporaryDirectory() as clip_dir:
+            results = run(clip_dir,**run_args)
+
+    results_json = json.dumps(results,indent=4)
+
+    if args.out != None:
+        with open(args.out,"w") as out_file:
+            out_file.write(results_json)
+    else:
+        print(results_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import pygame
+import time
 
 #constructor class for easily constructing events (to be inherited from)
 class PostEvent:
@@ -14,9 +15,11 @@ class PostEvent:
 EVENT_FRAME_SKIP = pygame.event.custom_type()
 
 class PostEvent_FrameSkip(PostEvent):
-    def __init__(self,frame_index:int):
+    def __init__(self,frame_index:int,preview:bool = False): #preview: part of a drag, a low resolution proxy may be shown until the drag settles
         args = {
-            "frame_index": frame_index
+            "frame_index": frame_index,
+            "preview": preview,
+            "requested_at": time.perf_counter(), #for measuring the latency until the frame is shown, see SeekScheduler
         }
         super().__init__(EVENT_FRAME_SKIP,args)
 
@@ -25,4 +28,64 @@ class PostEvent_FrameSkip(PostEvent):
 EVENT_PAUSE = pygame.event.custom_type()
 
 #play
-EVENT_PLAY = pygame.event.custom_type()
\ No newline at end of file
+EVENT_PLAY = pygame.event.custom_type()
+
+# export progress (posted from the export worker thread)
+# every export event carries the exporter that posted it ('exporter'), events from an exporter that has since been replaced are ignored
+EVENT_EXPORT_PROGRESS = pygame.event.custom_type()
+
+class PostEvent_ExportProgress(PostEvent):
+    def __init__(self,exporter,frames_done:int,frame_count:int,fps:float):
+        args = {
+            "exporter": exporter,
+            "frames_done": frames_done,
+            "frame_count": frame_count,
+            "fps": fps,
+        }
+        super().__init__(EVENT_EXPORT_PROGRESS,args)
+
+
+# export complete
+EVENT_EXPORT_COMPLETE = pygame.event.custom_type()
+
+class PostEvent_ExportComplete(PostEvent):
+    def __init__(self,exporter,out_fp:str):
+        args = {
+            "exporter": exporter,
+            "out_fp": out_fp
+        }
+        super().__init__(EVENT_EXPORT_COMPLETE,args)
+
+
+# export cancelled
+EVENT_EXPORT_CANCELLED = pygame.event.custom_type()
+
+class PostEvent_ExportCancelled(PostEvent):
+    def __init__(self,exporter):
+        args = {
+            "exporter": exporter
+        }
+        super().__init__(EVENT_EXPORT_CANCELLED,args)
+
+
+# proxy media transcoded (posted from the proxy worker thread)
+EVENT_PROXY_READY = pygame.event.custom_type()
+
+class PostEvent_ProxyReady(PostEvent):
+    def __init__(self,proxy_fp:str):
+        args = {
+            "proxy_fp": proxy_fp
+        }
+        super().__init__(EVENT_PROXY_READY,args)
+
+
+# export failed
+EVENT_EXPORT_FAILED = pygame.event.custom_type()
+
+class PostEvent_ExportFailed(PostEvent):
+    def __init__(self,exporter,error:Exception):
+        args = {
+            "exporter": exporter,
+            "error": error
+        }
+        super().__init__(EVENT_EXPORT_FAILED,args)
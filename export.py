@@ -0,0 +1,1161 @@
+import cv2
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+import functools
+import queue
+import shutil
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+#((x1,x2),(y1,y2)) given relative to the actual video size, as returned by CropOverlay.get_selection
+Selection = tuple[tuple[int,int],tuple[int,int]]
+
+#(left,top,width,height) in pixels of the actual video
+Rect = tuple[int,int,int,int]
+
+#called with (frames_done , frame_count , frames_per_second)
+ProgressCallback = Callable[[int,int,float],None]
+
+
+#codec presets, each a list of fourccs in order of preference. the first one the local OpenCV build can write is used
+CODEC_PRESETS = {
+    "fast": ["MJPG","mp4v"], #intra frame only (every frame is a keyframe), cheap to encode / seek / re-cut but large files, for intermediates
+    "balanced": ["mp4v"],
+    "small": ["avc1","H264","X264","mp4v"], #h264 where the OpenCV build has an encoder for it, slower to encode but smaller files, for archive
+}
+
+DEFAULT_CODEC = "balanced"
+
+#used if nothing requested can be written
+FALLBACK_FOURCC = "mp4v"
+
+
+#minimum time in seconds between progress callbacks, prevents flooding the receiver on fast exports
+PROGRESS_INTERVAL = 0.1
+
+#how often blocked pipeline stages wake up to check whether the export has been stopped
+_PIPELINE_POLL_INTERVAL = 0.1
+
+#placed on a pipeline queue to signal the end of the stream
+_END_OF_STREAM = None
+
+
+
+### HEADLESS API ###
+
+#crop the video at 'in_path' to 'rect' and write it to 'out_path', without opening a window.
+#this module only depends on cv2, so it can be used on machines without a display (or pygame).
+#mode is one of "serial" (export_crop), "pipelined" (export_crop_pipelined), "segmented" (export_crop_segmented) or "resumable" (export_crop_resumable),
+#None picks "pipelined" if more than one cpu is available, otherwise "serial".
+def crop_video(
+    in_path:str,
+    out_path:str,
+    rect:Rect,
+    fps:float | None = None,
+    fourcc:str = DEFAULT_CODEC, #fourcc or CODEC_PRESETS name
+    mode:str | None = None,
+    on_progress:ProgressCallback | None = None,
+    target_fps:float | None = None, #drop frames to get as close as possible to this output fps
+    start_frame:int = 0,
+    end_frame:int | None = None, #frame to stop before, None means the end of the video
+) -> None:
+    if mode == None:
+        mode = "pipelined" if (os.cpu_count() or 1) > 1 else "serial"
+
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"invalid export mode '{mode}', expected one of {list(EXPORT_MODES)}")
+
+    cap = _open_capture(in_path)
+    video_dimensions = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    in_fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    selection = rect_to_selection(rect,video_dimensions)
+
+    keep_every = keep_every_for_fps(in_fps,target_fps) if target_fps != None else 1
+
+    EXPORT_MODES[mode](in_path,out_path,selection,fps=fps,fourcc=fourcc,on_progress=on_progress,keep_every=keep_every,start_frame=start_frame,end_frame=end_frame)
+
+
+#convert (left,top,width,height) to a selection ((x1,x2),(y1,y2)), raises ValueError if it does not fit inside the video
+def rect_to_selection(rect:Rect,video_dimensions:tuple[int,int]) -> Selection:
+    left,top,width,height = rect
+    video_w,video_h = video_dimensions
+
+    if width <= 0 or height <= 0:
+        raise ValueError(f"invalid crop rect {rect}, width and height must be greater than 0")
+
+    if left < 0 or top < 0 or left + width > video_w or top + height > video_h:
+        raise ValueError(f"crop rect {rect} does not fit inside video of dimensions {video_dimensions}")
+
+    return ((left,left + width),(top,top + height))
+
+
+
+### EXPORT ###
+
+#write the selected area of each frame of the video at 'in_fp' to 'out_fp'
+#returns True if every frame was written, False if the export was cancelled via 'cancel_event' (nothing is left at 'out_fp')
+def export_crop(
+    in_fp:str,
+    out_fp:str,
+    selection:Selection,
+    fps:float | None = None, #None means use the fps of the input video
+    fourcc:str = DEFAULT_CODEC, #fourcc or CODEC_PRESETS name
+    on_progress:ProgressCallback | None = None,
+    cancel_event:threading.Event | None = None,
+    keep_every:int = 1, #only keep every nth frame, skipped frames are grabbed but never decoded
+    start_frame:int = 0, #first frame to export, the capture seeks straight to it
+    end_frame:int | None = None, #frame to stop before, None means the end of the video
+    reuse_buffers:bool = True, #decode / crop into preallocated buffers instead of allocating new arrays for every frame
+    allocation_counter:"FrameAllocationCounter | None" = None,
+) -> bool:
+    cap = _open_capture(in_fp)
+    out = None
+
+    partial_fp = _partial_path(out_fp)
+    completed = False
+
+    frames_done = 0
+    start_time = time.perf_counter()
+    last_progress_time = start_time
+
+    cancelled = False
+
+    try:
+        fps = _output_fps(cap,fps,keep_every)
+        frame_count = _output_frame_count(cap,keep_every,start_frame,end_frame)
+
+        out = _open_writer(partial_fp,resolve_fourcc(fourcc,out_fp),fps,selection)
+
+        limit = _seek_to_start_frame(cap,start_frame,end_frame)
+
+        #read each frame of video
+        for cropped_frame in _read_cropped_frames(cap,selection,keep_every=keep_every,reuse_buffers=reuse_buffers,allocation_counter=allocation_counter,limit=limit):
+            if cancel_event != None and cancel_event.is_set():
+                cancelled = True
+                break
+
+            out.write(cropped_frame)
+            frames_done += 1
+
+            now = time.perf_counter()
+            if on_progress != None and now - last_progress_time >= PROGRESS_INTERVAL:
+                last_progress_time = now
+                on_progress(frames_done,frame_count,frames_done / (now - start_time))
+
+        completed = not cancelled
+    finally:
+        cap.release()
+
+        if out != None:
+            out.release()
+
+        _finish_partial(partial_fp,out_fp,completed)
+
+    if not cancelled:
+        _report_final_progress(on_progress,frames_done,start_time)
+
+    return not cancelled
+
+
+
+#same output as 'export_crop', but decoding, cropping and encoding run concurrently as separate stages:
+# reader thread -> read queue -> crop thread(s) -> write queue -> writer (calling thread)
+#so that export speed approaches the slower of decode / encode rather than their sum.
+#at most (2 * queue_size + crop_threads) decoded frames are held in memory at once.
+def export_crop_pipelined(
+    in_fp:str,
+    out_fp:str,
+    selection:Selection,
+    fps:float | None = None,
+    fourcc:str = DEFAULT_CODEC, #fourcc or CODEC_PRESETS name
+    on_progress:ProgressCallback | None = None,
+    cancel_event:threading.Event | None = None,
+    keep_every:int = 1,
+    start_frame:int = 0,
+    end_frame:int | None = None,
+    queue_size:int = 8, #depth of each queue between stages
+    crop_threads:int = 1,
+) -> bool:
+    if queue_size < 1:
+        raise ValueError(f"invalid queue size '{queue_size}', minimum 1")
+
+    if crop_threads < 1:
+        raise ValueError(f"invalid crop thread count '{crop_threads}', minimum 1")
+
+    cap = _open_capture(in_fp)
+    out = None
+
+    partial_fp = _partial_path(out_fp)
+    completed = False
+
+    try:
+        fps = _output_fps(cap,fps,keep_every)
+        frame_count = _output_frame_count(cap,keep_every,start_frame,end_frame)
+
+        out = _open_writer(partial_fp,resolve_fourcc(fourcc,out_fp),fps,selection)
+
+        limit = _seek_to_start_frame(cap,start_frame,end_frame)
+    except Exception:
+        #once the stages have started they are released in the write stage's finally, below
+        cap.release()
+
+        if out != None:
+            out.release()
+
+        _finish_partial(partial_fp,out_fp,False)
+        raise
+
+    read_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+
+    #caps frames in flight, crop threads may finish out of order so the writer holds a reorder buffer which is bounded by this too
+    frames_in_flight = threading.Semaphore(2 * queue_size + crop_threads)
+
+    #set when the export is cancelled or a stage fails, every stage exits as soon as it sees it
+    stop_event = threading.Event()
+    errors : list[Exception] = []
+
+
+    ## STAGES ##
+
+    def read_stage():
+        try:
+            frame_index = 0
+            frames_read = 0
+            while not stop_event.is_set() and (limit == None or frames_read < limit):
+                #skip frames that are not kept without decoding them
+                if frames_read % keep_every != 0:
+                    if not cap.grab():
+                        break
+
+                    frames_read += 1
+                    continue
+
+                if not _acquire_until_stopped(frames_in_flight,stop_event):
+                    return
+
+                success,frame = cap.read()
+
+                if not success:
+                    break
+
+                frames_read += 1
+
+                if not _put_until_stopped(read_queue,(frame_index,frame),stop_event):
+                    return
+
+                frame_index += 1
+
+            #one end marker for each crop thread
+            for _ in range(crop_threads):
+                if not _put_until_stopped(read_queue,_END_OF_STREAM,stop_event):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+
+    def crop_stage():
+        try:
+            while True:
+                item = _get_until_stopped(read_queue,stop_event)
+
+                if item == None: #end of stream or stopped
+                    break
+
+                frame_index,frame = item
+                cropped_frame = _crop(frame,selection).copy() #copy so the full decoded frame can be freed straight away
+
+                if not _put_until_stopped(write_queue,(frame_index,cropped_frame),stop_event):
+                    return
+
+            _put_until_stopped(write_queue,_END_OF_STREAM,stop_event)
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+
+    workers = [threading.Thread(target=read_stage,daemon=True)]
+    workers += [threading.Thread(target=crop_stage,daemon=True) for _ in range(crop_threads)]
+
+    for worker in workers:
+        worker.start()
+
+
+    ## WRITE STAGE ##
+
+    frames_done = 0
+    start_time = time.perf_counter()
+    last_progress_time = start_time
+
+    pending_frames : dict[int,object] = {} #frames that arrived ahead of the next frame to write
+    ended_crop_threads = 0
+
+    cancelled = False
+
+    try:
+        while ended_crop_threads < crop_threads and not stop_event.is_set():
+            if cancel_event != None and cancel_event.is_set():
+                cancelled = True
+                break
+
+            try:
+                item = write_queue.get(timeout=_PIPELINE_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            if item == _END_OF_STREAM:
+                ended_crop_threads += 1
+                continue
+
+            frame_index,cropped_frame = item
+            pending_frames[frame_index] = cropped_frame
+
+            #write every frame that is now in order
+            while frames_done in pending_frames:
+                out.write(pending_frames.pop(frames_done))
+                frames_done += 1
+                frames_in_flight.release()
+
+            now = time.perf_counter()
+            if on_progress != None and now - last_progress_time >= PROGRESS_INTERVAL:
+                last_progress_time = now
+                on_progress(frames_done,frame_count,frames_done / (now - start_time))
+
+        completed = not cancelled and len(errors) == 0
+    finally:
+        stop_event.set()
+
+        for worker in workers:
+            worker.join()
+
+        cap.release()
+        out.release()
+
+        _finish_partial(partial_fp,out_fp,completed)
+
+    if len(errors) > 0:
+        raise errors[0]
+
+    if not cancelled:
+        _report_final_progress(on_progress,frames_done,start_time)
+
+    return not cancelled
+
+
+
+#same output as 'export_crop', but the frame range is split into 'segments' parts which are each encoded by their own process
+#(each with its own VideoCapture / VideoWriter), the segment files are then joined in order into 'out_fp'.
+#segments are joined with ffmpeg's concat demuxer (no re-encode) if ffmpeg is on the PATH, otherwise they are re-encoded
+#into 'out_fp' with a single VideoWriter (with a warning), which is correct but encodes twice and gives up the speedup.
+def export_crop_segmented(
+    in_fp:str,
+    out_fp:str,
+    selection:Selection,
+    fps:float | None = None,
+    fourcc:str = DEFAULT_CODEC, #fourcc or CODEC_PRESETS name
+    on_progress:ProgressCallback | None = None,
+    cancel_event:threading.Event | None = None,
+    keep_every:int = 1,
+    start_frame:int = 0,
+    end_frame:int | None = None,
+    segments:int | None = None, #None means one segment per cpu
+) -> bool:
+    if segments == None:
+        segments = os.cpu_count() or 1
+
+    if segments < 1:
+        raise ValueError(f"invalid segment count '{segments}', minimum 1")
+
+    _validate_frame_range(start_frame,end_frame)
+
+    #before encoding anything, rather than finding out at the end
+    _warn_if_reencoding_join()
+
+    #resolved once so that every segment (and the join) uses the same codec
+    fourcc = resolve_fourcc(fourcc,out_fp)
+
+    cap = _open_capture(in_fp)
+
+    fps = _output_fps(cap,fps,keep_every)
+    frame_count = _output_frame_count(cap,keep_every,start_frame,end_frame)
+    input_frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    #segments start on a kept frame so that each one keeps the same frames the serial export would
+    frame_ranges = _split_frame_range(start_frame,end_frame,input_frame_count,segments,align=keep_every)
+
+    #segment files are written next to the output so that joining them does not cross filesystems
+    segment_dir = tempfile.mkdtemp(prefix=".segments_",dir=os.path.dirname(os.path.abspath(out_fp)))
+    out_ext = os.path.splitext(out_fp)[1]
+    segment_fps = [os.path.join(segment_dir,f"segment_{i:04d}{out_ext}") for i in range(len(frame_ranges))]
+
+    start_time = time.perf_counter()
+    last_progress_time = start_time
+
+    cancelled = False
+
+    #spawn rather than fork, the parent may be running pygame and other threads
+    mp_context = multiprocessing.get_context("spawn")
+
+    try:
+        with mp_context.Manager() as manager:
+            progress_queue = manager.Queue()
+            stop_event = manager.Event()
+
+            segment_frames_done = [0] * len(frame_ranges)
+
+            with ProcessPoolExecutor(max_workers=len(frame_ranges),mp_context=mp_context) as pool:
+                futures = [
+                    pool.submit(_export_segment,in_fp,segment_fp,selection,fps,fourcc,start,end,keep_every,segment_index,progress_queue,stop_event)
+                    for segment_index,(segment_fp,(start,end)) in enumerate(zip(segment_fps,frame_ranges))
+                ]
+
+                while not all(future.done() for future in futures):
+                    if cancel_event != None and cancel_event.is_set() and not cancelled:
+                        cancelled = True
+                        stop_event.set()
+
+                    try:
+                        segment_index,frames_done = progress_queue.get(timeout=_PIPELINE_POLL_INTERVAL)
+                        segment_frames_done[segment_index] = frames_done
+                    except queue.Empty:
+                        pass
+
+                    now = time.perf_counter()
+                    if on_progress != None and now - last_progress_time >= PROGRESS_INTERVAL:
+                        last_progress_time = now
+                        total_done = sum(segment_frames_done)
+                        on_progress(total_done,frame_count,total_done / (now - start_time))
+
+                #raises if any segment failed
+                segment_frame_counts = [future.result() for future in futures]
+
+        if cancelled:
+            return False
+
+        #every segment with an end reads a fixed range, a short one means the seek landed on the wrong frame
+        for segment_index,(start,end) in enumerate(frame_ranges):
+            if end == None:
+                continue
+
+            expected_frame_count = _output_frame_count_of(end - start,keep_every)
+            if segment_frame_counts[segment_index] != expected_frame_count:
+                raise Exception(f"segment {segment_index} wrote {segment_frame_counts[segment_index]} frames, expected {expected_frame_count}.")
+
+        _join_segments(segment_fps,out_fp,fourcc,fps,selection)
+    finally:
+        shutil.rmtree(segment_dir,ignore_errors=True)
+
+    _report_final_progress(on_progress,sum(segment_frame_counts),start_time)
+
+    return True
+
+
+#same output as 'export_crop', but written as fixed size segments of 'segment_frames' input frames into 'work_dir'
+#(default '<out_fp>.parts'), with a manifest recording each finished segment. if the export is cancelled or the process dies,
+#rerunning the same export resumes from the first unfinished segment. once every segment is written they are joined
+#into 'out_fp' (as in export_crop_segmented) and 'work_dir' is removed.
+def export_crop_resumable(
+    in_fp:str,
+    out_fp:str,
+    selection:Selection,
+    fps:float | None = None,
+    fourcc:str = DEFAULT_CODEC,
+    on_progress:ProgressCallback | None = None,
+    cancel_event:threading.Event | None = None,
+    keep_every:int = 1,
+    start_frame:int = 0,
+    end_frame:int | None = None,
+    segment_frames:int = 1000,
+    work_dir:str | None = None,
+) -> bool:
+    if segment_frames < 1:
+        raise ValueError(f"invalid segment length '{segment_frames}', minimum 1")
+
+    _validate_frame_range(start_frame,end_frame)
+
+    _warn_if_reencoding_join()
+
+    fourcc = resolve_fourcc(fourcc,out_fp)
+
+    #segments start on a kept frame so that each one keeps the same frames the serial export would
+    segment_frames = max(keep_every,segment_frames // keep_every * keep_every)
+
+    if work_dir == None:
+        work_dir = f"{out_fp}.parts"
+
+    cap = _open_capture(in_fp)
+
+    fps = _output_fps(cap,fps,keep_every)
+    frame_count = _output_frame_count(cap,keep_every,start_frame,end_frame)
+    input_frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    #identifies the job, a manifest left by a different job (or a changed input file) is not resumed
+    job = {
+        "in_fp": os.path.abspath(in_fp),
+        "in_size": os.path.getsize(in_fp),
+        "in_mtime": os.path.getmtime(in_fp),
+        "selection": [list(selection[0]),list(selection[1])],
+        "fps": fps,
+        "fourcc": fourcc,
+        "keep_every": keep_every,
+        "start_frame": start_frame,
+        "end_frame": end_frame,
+        "segment_frames": segment_frames,
+    }
+
+    manifest = _load_manifest(work_dir)
+
+    if manifest == None or manifest["job"] != job:
+        shutil.rmtree(work_dir,ignore_errors=True)
+        os.makedirs(work_dir)
+        manifest = {"job": job,"segments": []}
+        _save_manifest(work_dir,manifest)
+
+    completed_segments = {segment["index"]: segment for segment in manifest["segments"]}
+
+    out_ext = os.path.splitext(out_fp)[1]
+
+    frames_done = sum(segment["frames"] for segment in manifest["segments"])
+    start_time = time.perf_counter()
+    last_progress_time = start_time
+
+    #position of the capture, so it only has to seek when skipping over finished segments
+    cap_frame = 0
+
+    cancelled = False
+
+    out = None
+
+    try:
+        segment_index = 0
+        while True:
+            start = start_frame + segment_index * segment_frames
+            end = start + segment_frames if end_frame == None else min(start + segment_frames,end_frame)
+
+            if end_frame != None and start >= end_frame:
+                break
+
+            #already written by a previous run
+            if segment_index in completed_segments:
+                if completed_segments[segment_index]["last"]:
+                    break
+
+                segment_index += 1
+                continue
+
+            if cancel_event != None and cancel_event.is_set():
+                cancelled = True
+                break
+
+            if cap_frame != start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES,start)
+
+            #written under a temporary name and renamed once finished, so a crash never leaves a partial segment that looks finished
+            segment_file = f"segment_{segment_index:06d}{out_ext}"
+            partial_fp = os.path.join(work_dir,f"partial_{segment_file}")
+
+            out = _open_writer(partial_fp,fourcc,fps,selection)
+
+            segment_frames_done = 0
+            for cropped_frame in _read_cropped_frames(cap,selection,keep_every=keep_every,limit=end - start):
+                if cancel_event != None and cancel_event.is_set():
+                    cancelled = True
+                    break
+
+                out.write(cropped_frame)
+                segment_frames_done += 1
+
+                now = time.perf_counter()
+                if on_progress != None and now - last_progress_time >= PROGRESS_INTERVAL:
+                    last_progress_time = now
+                    on_progress(frames_done + segment_frames_done,frame_count,segment_frames_done / (now - start_time))
+
+            out.release()
+
+            #the unfinished segment is thrown away, it is rewritten on resume
+            if cancelled:
+                os.remove(partial_fp)
+                break
+
+            cap_frame = end
+
+            #a segment inside the video reads a fixed range, a short one means the seek landed on the wrong frame.
+            #the segment the video ends in is the only one that can be short
+            expected_frame_count = _output_frame_count_of(end - start,keep_every)
+            if end <= input_frame_count and segment_frames_done != expected_frame_count:
+                os.remove(partial_fp)
+                raise Exception(f"segment {segment_index} wrote {segment_frames_done} frames, expected {expected_frame_count}.")
+
+            #fewer frames than the range holds means the end of the video was reached
+            is_last = segment_frames_done < expected_frame_count or end == end_frame
+
+            if segment_frames_done == 0:
+                os.remove(partial_fp)
+
+                #mark the previous segment as the last one
+                if len(manifest["segments"]) > 0:
+                    manifest["segments"][-1]["last"] = True
+                    _save_manifest(work_dir,manifest)
+                break
+
+            os.replace(partial_fp,os.path.join(work_dir,segment_file))
+
+            manifest["segments"].append({
+                "index": segment_index,
+                "start": start,
+                "end": end,
+                "frames": segment_frames_done,
+                "file": segment_file,
+                "last": is_last,
+            })
+            _save_manifest(work_dir,manifest)
+
+            frames_done += segment_frames_done
+            start_time = time.perf_counter() #throughput is reported per segment, earlier segments may come from a previous run
+
+            if is_last:
+                break
+
+            segment_index += 1
+    finally:
+        cap.release()
+
+        if out != None:
+            out.release()
+
+    if cancelled:
+        return False
+
+    segments = sorted(manifest["segments"],key=lambda segment: segment["index"])
+
+    if len(segments) == 0:
+        raise Exception(f"no frames could be read from '{in_fp}' in the range [{start_frame},{end_frame}).")
+
+    _join_segments([os.path.join(work_dir,segment["file"]) for segment in segments],out_fp,fourcc,fps,selection)
+
+    shutil.rmtree(work_dir,ignore_errors=True)
+
+    _report_final_progress(on_progress,frames_done,start_time)
+
+    return True
+
+
+#runs 'export_crop' and 'export_crop_segmented' on the same input and compares them.
+#returns a dict with the time taken by each, the speedup of the segmented export, the frame count of each output (and whether
+#they match), and how the segments were joined (see segment_join_method), without ffmpeg the segmented export is expected to be slower
+def measure_segmented_speedup(in_fp:str,selection:Selection,segments:int | None = None,fourcc:str = DEFAULT_CODEC) -> dict:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        serial_fp = os.path.join(temp_dir,"serial.mp4")
+        segmented_fp = os.path.join(temp_dir,"segmented.mp4")
+
+        start_time = time.perf_counter()
+        export_crop(in_fp,serial_fp,selection,fourcc=fourcc)
+        serial_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        export_crop_segmented(in_fp,segmented_fp,selection,fourcc=fourcc,segments=segments)
+        segmented_seconds = time.perf_counter() - start_time
+
+        serial_frame_count = _count_frames(serial_fp)
+        segmented_frame_count = _count_frames(segmented_fp)
+
+    return {
+        "serial_seconds": serial_seconds,
+        "segmented_seconds": segmented_seconds,
+        "speedup": serial_seconds / segmented_seconds,
+        "serial_frame_count": serial_frame_count,
+        "segmented_frame_count": segmented_frame_count,
+        "frame_counts_match": serial_frame_count == segmented_frame_count,
+        "join": segment_join_method(),
+    }
+
+
+
+#runs 'export_crop' with and without buffer reuse on the same input and compares them.
+#returns a dict, for each run, of the frame sized allocations made by the frame loop and the peak traced memory
+def measure_export_allocations(in_fp:str,selection:Selection,fourcc:str = DEFAULT_CODEC) -> dict:
+    results = {}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for reuse_buffers in (False,True):
+            allocation_counter = FrameAllocationCounter()
+
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            export_crop(in_fp,os.path.join(temp_dir,"out.mp4"),selection,fourcc=fourcc,reuse_buffers=reuse_buffers,allocation_counter=allocation_counter)
+            seconds = time.perf_counter() - start_time
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results["reuse_buffers" if reuse_buffers else "allocating"] = {
+                "seconds": seconds,
+                "allocations": allocation_counter.allocations,
+                "allocated_bytes": allocation_counter.allocated_bytes,
+                "peak_traced_bytes": peak_bytes,
+            }
+
+    return results
+
+
+
+### FRAME LOOP ###
+
+#counts the frame sized arrays allocated while exporting (by decode, crop, or cv2 copying a non-contiguous crop on write)
+class FrameAllocationCounter:
+    def __init__(self):
+        self.allocations = 0
+        self.allocated_bytes = 0
+
+    def count(self,nbytes:int) -> None:
+        self.allocations += 1
+        self.allocated_bytes += nbytes
+
+
+#yields the selected area of every 'keep_every'th frame read from 'cap', stopping after 'limit' frames (kept or skipped) if given.
+#with reuse_buffers every frame is decoded into the same buffer and copied into the same contiguous crop buffer
+#(or yielded as is if the selection is the whole frame), so a yielded frame is overwritten by the next one.
+#without, each frame is a new array and the crop is a non-contiguous view that cv2 copies again on write.
+def _read_cropped_frames(cap:cv2.VideoCapture,selection:Selection,keep_every:int = 1,reuse_buffers:bool = True,allocation_counter:FrameAllocationCounter | None = None,limit:int | None = None):
+    frame_buffer = None
+    crop_buffer = None
+
+    frames_read = 0
+
+    while limit == None or frames_read < limit:
+        #skip frames that are not kept without decoding them (grab demuxes only, retrieve is never called)
+        if frames_read % keep_every != 0:
+            if not cap.grab():
+                break
+
+            frames_read += 1
+            continue
+
+        if reuse_buffers:
+            success,frame = cap.read(frame_buffer)
+        else:
+            success,frame = cap.read()
+
+        if not success:
+            break
+
+        frames_read += 1
+
+        #cap.read returns the buffer it was given unless it does not fit (first frame), in which case it allocates a new one
+        if frame is not frame_buffer:
+            if allocation_counter != None:
+                allocation_counter.count(frame.nbytes)
+
+            if reuse_buffers:
+                frame_buffer = frame
+
+        if _is_full_frame(frame,selection):
+            yield frame
+            continue
+
+        cropped_frame = _crop(frame,selection)
+
+        if not reuse_buffers:
+            #cv2 has to copy non-contiguous arrays before it can write them
+            if allocation_counter != None and not cropped_frame.flags.c_contiguous:
+                allocation_counter.count(cropped_frame.nbytes)
+
+            yield cropped_frame
+            continue
+
+        if crop_buffer is None:
+            crop_buffer = np.empty(cropped_frame.shape,cropped_frame.dtype)
+
+            if allocation_counter != None:
+                allocation_counter.count(crop_buffer.nbytes)
+
+        np.copyto(crop_buffer,cropped_frame)
+        yield crop_buffer
+
+def _is_full_frame(frame,selection:Selection) -> bool:
+    x_range,y_range = selection
+    return x_range == (0,frame.shape[1]) and y_range == (0,frame.shape[0])
+
+
+
+### CODECS ###
+
+#returns True if this OpenCV build can write 'fourcc' into a file with the given extension (e.g ".mp4").
+#checked by writing a tiny file, results are cached for the lifetime of the process
+@functools.lru_cache(maxsize=None)
+def is_fourcc_supported(fourcc:str,extension:str) -> bool:
+    if len(fourcc) != 4:
+        return False
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        probe_fp = os.path.join(temp_dir,f"probe{extension}")
+
+        out = cv2.VideoWriter(probe_fp,cv2.VideoWriter.fourcc(*fourcc),30,(64,64))
+
+        if not out.isOpened():
+            return False
+
+        out.write(np.zeros((64,64,3),dtype=np.uint8))
+        out.release()
+
+        return os.path.exists(probe_fp) and os.path.getsize(probe_fp) > 0
+
+#returns the fourcc each preset resolves to for the given extension, None if none of its fourccs are supported
+def probe_codecs(extension:str = ".mp4") -> dict[str,str | None]:
+    return {
+        preset: next((fourcc for fourcc in fourccs if is_fourcc_supported(fourcc,extension)),None)
+        for preset,fourccs in CODEC_PRESETS.items()
+    }
+
+#returns the fourcc to write 'out_fp' with, given a fourcc or a CODEC_PRESETS name.
+#falls back (with a warning) to FALLBACK_FOURCC if nothing requested is supported, raises if that is not supported either
+def resolve_fourcc(fourcc_or_preset:str,out_fp:str) -> str:
+    extension = os.path.splitext(out_fp)[1]
+
+    if fourcc_or_preset in CODEC_PRESETS:
+        candidates = CODEC_PRESETS[fourcc_or_preset]
+    else:
+        candidates = [fourcc_or_preset]
+
+    for fourcc in candidates:
+        if is_fourcc_supported(fourcc,extension):
+            return fourcc
+
+    if FALLBACK_FOURCC not in candidates and is_fourcc_supported(FALLBACK_FOURCC,extension):
+        warnings.warn(f"codec '{fourcc_or_preset}' cannot be written to '{extension}' files by this OpenCV build, using '{FALLBACK_FOURCC}' instead.")
+        return FALLBACK_FOURCC
+
+    raise Exception(f"codec '{fourcc_or_preset}' cannot be written to '{extension}' files by this OpenCV build.")
+
+
+
+### SEGMENTS ###
+
+#split [start_frame,end_frame) into at most 'segments' contiguous ranges. if end_frame is None the last range has no end
+#so that it reads to the end of the video (the frame count reported by the container can be inaccurate)
+#every range but the last is a multiple of 'align' frames long
+def _split_frame_range(start_frame:int,end_frame:int | None,frame_count:int,segments:int,align:int = 1) -> list[tuple[int,int | None]]:
+    total = (end_frame if end_frame != None else frame_count) - start_frame
+
+    segments = max(1,min(segments,total // align))
+    segment_length = (total // segments) // align * align
+
+    frame_ranges = []
+    for i in range(segments):
+        start = start_frame + i * segment_length
+        end = start + segment_length if i < segments - 1 else end_frame
+        frame_ranges.append((start,end))
+
+    return frame_ranges
+
+#runs in a worker process, writes frames [start,end) of the cropped video to 'segment_fp', returns the number of frames written
+def _export_segment(in_fp:str,segment_fp:str,selection:Selection,fps:float,fourcc:str,start:int,end:int | None,keep_every:int,segment_index:int,progress_queue,stop_event) -> int:
+    cap = _open_capture(in_fp)
+    cap.set(cv2.CAP_PROP_POS_FRAMES,start)
+
+    out = _open_writer(segment_fp,fourcc,fps,selection)
+
+    frames_done = 0
+    last_progress_time = time.perf_counter()
+
+    limit = end - start if end != None else None
+
+    for cropped_frame in _read_cropped_frames(cap,selection,keep_every=keep_every,limit=limit):
+        if stop_event.is_set():
+            break
+
+        out.write(cropped_frame)
+        frames_done += 1
+
+        now = time.perf_counter()
+        if now - last_progress_time >= PROGRESS_INTERVAL:
+            last_progress_time = now
+            progress_queue.put((segment_index,frames_done))
+
+    progress_queue.put((segment_index,frames_done))
+
+    cap.release()
+    out.release()
+
+    return frames_done
+
+#returns the manifest in 'work_dir', or None if there is not a readable one
+def _load_manifest(work_dir:str) -> dict | None:
+    try:
+        with open(os.path.join(work_dir,"manifest.json")) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError,ValueError):
+        return None
+
+#written to a temporary file and renamed, so the manifest on disk is always complete
+def _save_manifest(work_dir:str,manifest:dict) -> None:
+    manifest_fp = os.path.join(work_dir,"manifest.json")
+
+    with open(f"{manifest_fp}.tmp","w") as manifest_file:
+        json.dump(manifest,manifest_file,indent=4)
+
+    os.replace(f"{manifest_fp}.tmp",manifest_fp)
+
+#how segment files are joined into the output, "concat" (ffmpeg's concat demuxer, no re-encode) if ffmpeg is on the PATH,
+#otherwise "reencode" (every frame is decoded and encoded again, a second lossy encode which is slower than a serial export)
+def segment_join_method() -> str:
+    return "concat" if shutil.which("ffmpeg") != None else "reencode"
+
+def _warn_if_reencoding_join() -> None:
+    if segment_join_method() == "reencode":
+        warnings.warn("ffmpeg is not on the PATH, segments will be joined by re-encoding them. the output is encoded twice and the export is slower than a serial one.")
+
+#join segment files, in order, into 'out_fp'
+def _join_segments(segment_fps:list[str],out_fp:str,fourcc:str,fps:float,selection:Selection) -> None:
+    ffmpeg = shutil.which("ffmpeg")
+
+    if ffmpeg != None:
+        #stream copy, no re-encode
+        list_fp = os.path.join(os.path.dirname(segment_fps[0]),"segments.txt")
+        with open(list_fp,"w") as list_file:
+            for segment_fp in segment_fps:
+                #quoted, a ' in the path closes the quotes, is escaped, then reopens them
+                escaped_segment_fp = segment_fp.replace("'","'\\''")
+                list_file.write(f"file '{escaped_segment_fp}'\n")
+
+        subprocess.run(
+            [ffmpeg,"-y","-loglevel","error","-f","concat","-safe","0","-i",list_fp,"-c","copy",out_fp],
+            check=True,
+        )
+        return
+
+    #no ffmpeg, re-encode every segment into a single writer
+    out = _open_writer(out_fp,fourcc,fps,selection)
+
+    for segment_fp in segment_fps:
+        cap = _open_capture(segment_fp)
+
+        while True:
+            success,frame = cap.read()
+
+            if not success:
+                break
+
+            out.write(frame)
+
+        cap.release()
+
+    out.release()
+
+def _count_frames(fp:str) -> int:
+    cap = _open_capture(fp)
+
+    frame_count = 0
+    while cap.grab():
+        frame_count += 1
+
+    cap.release()
+    return frame_count
+
+
+
+### UTILITY ###
+
+#number of input frames per output frame needed to get as close as possible to 'target_fps'
+def keep_every_for_fps(in_fps:float,target_fps:float) -> int:
+    if target_fps <= 0:
+        raise ValueError(f"invalid target fps '{target_fps}', must be greater than 0")
+
+    return max(1,round(in_fps / target_fps))
+
+#output fps, dropping frames shortens the output unless the fps is lowered by the same factor
+def _output_fps(cap:cv2.VideoCapture,fps:float | None,keep_every:int) -> float:
+    if keep_every < 1:
+        raise ValueError(f"invalid keep_every '{keep_every}', minimum 1")
+
+    if fps != None:
+        return fps
+
+    return cap.get(cv2.CAP_PROP_FPS) / keep_every
+
+def _output_frame_count(cap:cv2.VideoCapture,keep_every:int,start_frame:int = 0,end_frame:int | None = None) -> int:
+    if end_frame == None:
+        end_frame = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    return _output_frame_count_of(max(0,end_frame - start_frame),keep_every)
+
+#frames 0, keep_every, 2*keep_every ... of 'frame_count' frames
+def _output_frame_count_of(frame_count:int,keep_every:int) -> int:
+    return -(-frame_count // keep_every)
+
+#seek straight to 'start_frame' rather than decoding everything before it,
+#returns the number of frames to read from there (None means to the end of the video)
+def _seek_to_start_frame(cap:cv2.VideoCapture,start_frame:int,end_frame:int | None) -> int | None:
+    _validate_frame_range(start_frame,end_frame)
+
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES,start_frame)
+
+    return end_frame - start_frame if end_frame != None else None
+
+def _validate_frame_range(start_frame:int,end_frame:int | None) -> None:
+    if start_frame < 0:
+        raise ValueError(f"invalid start frame '{start_frame}', minimum 0")
+
+    if end_frame != None and end_frame <= start_frame:
+        raise ValueError(f"invalid end frame '{end_frame}', must be greater than start frame '{start_frame}'")
+
+def _open_capture(in_fp:str) -> cv2.VideoCapture:
+    cap = cv2.VideoCapture(in_fp)
+
+    if cap.isOpened() == False:
+        raise Exception(f"video '{in_fp}' could not be opened.")
+
+    return cap
+
+#exports are written under this name and renamed to 'out_fp' once complete, so a cancelled or failed export
+#never leaves a truncated file behind that still plays. the extension is kept, the writer picks the container from it
+def _partial_path(out_fp:str) -> str:
+    root,extension = os.path.splitext(out_fp)
+    return f"{root}.partial{extension}"
+
+#move a complete export into place, or remove what was written of an unfinished one
+def _finish_partial(partial_fp:str,out_fp:str,completed:bool) -> None:
+    if completed:
+        os.replace(partial_fp,out_fp)
+    elif os.path.exists(partial_fp):
+        os.remove(partial_fp)
+
+#'fourcc' must be a fourcc, not a preset (see resolve_fourcc)
+def _open_writer(out_fp:str,fourcc:str,fps:float,selection:Selection) -> cv2.VideoWriter:
+    x_range,y_range = selection
+
+    #cropped frame size
+    frame_w = x_range[1] - x_range[0]
+    frame_h = y_range[1] - y_range[0]
+
+    #video writer constructor
+    out = cv2.VideoWriter(out_fp,cv2.VideoWriter.fourcc(*fourcc),fps,(frame_w,frame_h))
+
+    #an unopened writer silently drops every frame, leaving an empty file
+    if not out.isOpened():
+        raise Exception(f"video writer for '{out_fp}' could not be opened with codec '{fourcc}'.")
+
+    return out
+
+#returns a view of the selected area of the frame
+def _crop(frame,selection:Selection):
+    x_range,y_range = selection
+    return frame[ y_range[0]:y_range[1], x_range[0]:x_range[1] ] #write colum first and width after? seems to work.
+
+#final progress report, frame count reported by the container can be inaccurate so report what was actually written
+def _report_final_progress(on_progress:ProgressCallback | None,frames_done:int,start_time:float) -> None:
+    if on_progress == None:
+        return
+
+    elapsed = time.perf_counter() - start_time
+    on_progress(frames_done,frames_done,frames_done / elapsed if elapsed > 0 else 0.0)
+
+
+#blocking queue / semaphore operations that give up once 'stop_event' is set, so no stage can deadlock when another stops early
+def _put_until_stopped(q:queue.Queue,item,stop_event:threading.Event) -> bool:
+    while not stop_event.is_set():
+        try:
+            q.put(item,timeout=_PIPELINE_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+#returns None if stopped
+def _get_until_stopped(q:queue.Queue,stop_event:threading.Event):
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=_PIPELINE_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+
+    return None
+
+def _acquire_until_stopped(semaphore:threading.Semaphore,stop_event:threading.Event) -> bool:
+    while not stop_event.is_set():
+        if semaphore.acquire(timeout=_PIPELINE_POLL_INTERVAL):
+            return True
+
+    return False
+
+
+
+#export implementation for each mode accepted by crop_video
+EXPORT_MODES = {
+    "serial": export_crop,
+    "pipelined": export_crop_pipelined,
+    "segmented": export_crop_segmented,
+    "resumable": export_crop_resumable,
+}
+
+
+
+### CLI ###
+
+#prints the probed codec presets and exits, like argparse's 'version' action (so in_path / out_path are not required)
+class _ListCodecsAction(argparse.Action):
+    def __init__(self,option_strings,dest,help=None):
+        super().__init__(option_strings=option_strings,dest=dest,nargs=0,default=argparse.SUPPRESS,help=help)
+
+    def __call__(self,parser,namespace,values,option_string=None):
+        for extension in (".mp4",".avi",".mkv"):
+            presets = ", ".join(f"{preset}={fourcc}" for preset,fourcc in probe_codecs(extension).items())
+            print(f"{extension}: {presets}")
+
+        parser.exit()
+
+def main(argv:list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="crop a video without opening a window.")
+    parser.add_argument("in_path",help="video to crop")
+    parser.add_argument("out_path",help="where to write the cropped video")
+    parser.add_argument("--rect",type=int,nargs=4,required=True,metavar=("LEFT","TOP","WIDTH","HEIGHT"),help="area to keep, in pixels of the input video")
+    parser.add_argument("--fps",type=float,default=None,help="output fps (default: input fps, divided by the frames dropped by --target-fps)")
+    parser.add_argument("--target-fps",type=float,default=None,help="drop frames to get as close as possible to this fps, dropped frames are never decoded")
+    parser.add_argument("--fourcc",default=DEFAULT_CODEC,help=f"output codec, a fourcc or one of the presets {list(CODEC_PRESETS)} (default: {DEFAULT_CODEC})")
+    parser.add_argument("--list-codecs",action=_ListCodecsAction,help="print which fourcc each codec preset uses with this OpenCV build, then exit")
+    parser.add_argument("--start",type=int,default=0,help="first frame to export (default: 0)")
+    parser.add_argument("--end",type=int,default=None,help="frame to stop before (default: end of video)")
+    parser.add_argument("--mode",choices=list(EXPORT_MODES),default=None,help="export implementation (default: pipelined if more than one cpu, otherwise serial)")
+    parser.add_argument("--quiet",action="store_true",help="do not print progress")
+
+    args = parser.parse_args(argv)
+
+    def print_progress(frames_done:int,frame_count:int,fps:float):
+        print(f"\r{frames_done}/{frame_count} frames ({fps:.0f} fps)",end="",file=sys.stderr,flush=True)
+
+    #e.g a --rect outside the video or --end before --start, reported as a usage error rather than a traceback
+    try:
+        crop_video(
+            in_path=args.in_path,
+            out_path=args.out_path,
+            rect=tuple(args.rect),
+            fps=args.fps,
+            fourcc=args.fourcc,
+            mode=args.mode,
+            target_fps=args.target_fps,
+            start_frame=args.start,
+            end_frame=args.end,
+            on_progress=None if args.quiet else print_progress,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if not args.quiet:
+        print(file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()